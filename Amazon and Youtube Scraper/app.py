@@ -1,18 +1,110 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file, jsonify, abort, Response
 import os
 from werkzeug.security import generate_password_hash, check_password_hash
 from scrapers.youtube_scraper import scrape_youtube_videos
 from scrapers.amazon_scraper import AmazonScraper
-import csv
+from results import ResultStore, EXPORT_FORMATS, SCRAPERS
+from scrapers.archive import PageArchive, reparse_job
+from scrapers.channel_index import ChannelIndex
+from scrapers.export import SharedSink, TeeSink, TimedSink
+from scrapers.driver_pool import get_default_pool
+from scrapers.rate_limit import get_host_limiter
+from jobs import BatchScheduler, JobManager, QUEUED, RUNNING
+from metrics import scrape_metrics, record_job
+from cache import ResultCache, cache_key, MISS
+from history import PriceHistory
+from preview import SORTS as PREVIEW_SORTS
 import sqlite3
+import csv
 import functools
-import json
-import pandas as pd
-import shutil
+import io
+import multiprocessing
+import threading
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import urlparse
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 
+# Prometheus metrics served at /metrics; every finished job's stage timings are added
+metrics = scrape_metrics()
+# Scrapes run in the background; this bounds how many run at the same time
+jobs = JobManager(max_workers=int(os.environ.get('SCRAPE_WORKERS', 2)),
+                  on_finish=lambda job: record_job(metrics, job))
+# Batches of queries share their own workers, taking hosts and batches in turn
+batches = BatchScheduler(
+    jobs,
+    max_workers=int(os.environ.get('BATCH_WORKERS', os.environ.get('DRIVER_POOL_SIZE', 2))),
+    per_host=int(os.environ.get('BATCH_PER_HOST', 0)) or None,  # Every batch worker by default
+)
+BATCH_MAX_QUERIES = int(os.environ.get('BATCH_MAX_QUERIES', 200))
+# Results are stored once per user and job as NDJSON; other download formats are
+# converted on demand. Old jobs are removed by quota and by a background sweeper.
+results = ResultStore(
+    'output',
+    ttl=float(os.environ.get('RESULT_TTL_HOURS', 24)) * 3600,
+    max_jobs=int(os.environ.get('RESULT_MAX_JOBS', 10)),
+    max_bytes=int(os.environ.get('RESULT_MAX_MB', 500)) * 1024 * 1024,
+)
+# Identical queries within the TTL share one scrape
+cache = ResultCache(
+    os.path.join('output', '.cache'),
+    ttl=float(os.environ.get('CACHE_TTL_SECONDS', 900)),
+    max_entries=int(os.environ.get('CACHE_MAX_ENTRIES', 200)),
+)
+# Videos seen per YouTube channel, for incremental re-scrapes
+channels = ChannelIndex(os.path.join('output', '.channels'))
+# Every scraped Amazon product, kept across scrapes for price history
+history = PriceHistory(os.environ.get('HISTORY_DB', 'history.db'))
+# Raw HTML of every fetched page, so past scrapes can be re-parsed after an extractor fix;
+# the results sweeper deletes pages older than PAGE_ARCHIVE_DAYS
+archive = PageArchive(os.environ.get('PAGE_ARCHIVE_DIR', 'archive')) if os.environ.get('PAGE_ARCHIVE', '1') != '0' else None
+ARCHIVE_TTL = float(os.environ.get('PAGE_ARCHIVE_DAYS', 30)) * 86400
+
+def prune_archive(now):
+    if archive:
+        archive.prune(now - ARCHIVE_TTL)
+
+def active_job_ids():
+    # Results still being written; a batch's results live under the batch's id
+    return ([job.id for job in jobs.all_jobs() if not job.finished]
+            + [batch.id for batch in batches.all_batches() if not batch.finished])
+
+# Re-parse workers are spawned processes that import this module again when the app
+# is started with `python app.py`; only the server itself cleans up and sweeps
+if multiprocessing.current_process().name == 'MainProcess':
+    cache.remove_orphans()
+    results.start_sweeper(interval=float(os.environ.get('RESULT_SWEEP_SECONDS', 600)), active=active_job_ids,
+                          on_sweep=prune_archive)
+
+def job_gauges():
+    counts = {QUEUED: 0, RUNNING: 0}
+    for job in jobs.all_jobs():
+        if job.status in counts:
+            counts[job.status] += 1
+    return [({'status': status}, count) for status, count in counts.items()]
+
+def browser_gauges():
+    pool = get_default_pool()
+    return [({'state': 'idle'}, pool.idle), ({'state': 'max'}, pool.max_size)]
+
+metrics.collect('scrape_jobs', 'Scrape jobs waiting for or holding a worker.', job_gauges)
+metrics.collect('scrape_batch_queued', 'Batch queries waiting for a batch worker.', lambda: [({}, batches.queued())])
+metrics.collect('scrape_workers', 'Scrape jobs that can run at once.', lambda: [({}, jobs.max_workers)])
+metrics.collect('browser_pool_drivers', 'Pooled browsers idle, and the most that can run at once.', browser_gauges)
+metrics.collect('browser_starts_total', 'Browsers started by the pool.',
+                lambda: [({}, get_default_pool().starts)], kind='counter')
+metrics.collect('browser_recycles_total', 'Browsers retired as worn out or unhealthy.',
+                lambda: [({}, get_default_pool().recycles)], kind='counter')
+metrics.collect('host_request_interval_seconds', 'Current adaptive spacing between requests to each host.',
+                lambda: [({'host': host}, round(interval, 3)) for host, interval in get_host_limiter().intervals().items()])
+metrics.collect('result_cache_entries', 'Cached scrape results.', lambda: [({}, cache.stats()['entries'])])
+metrics.collect('result_cache_lookups_total', 'Cache lookups by outcome.',
+                lambda: [({'result': name}, cache.stats()[name]) for name in ('hits', 'misses', 'coalesced')],
+                kind='counter')
+
 # Database initialization
 def init_db():
     conn = sqlite3.connect('users.db')
@@ -24,47 +116,11 @@ def init_db():
 
 init_db()
 
-def clear_output_directory():
-    """Clear all files in the output directory"""
-    if os.path.exists('output'):
-        for filename in os.listdir('output'):
-            file_path = os.path.join('output', filename)
-            try:
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
-            except Exception as e:
-                print(f"Error deleting {file_path}: {e}")
-
-def check_file_has_data(file_path):
-    if not os.path.exists(file_path):
-        return False
-    
-    try:
-        if file_path.endswith('.csv'):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                csv_reader = csv.reader(f)
-                # Skip header row
-                next(csv_reader, None)
-                # Check if there's at least one data row
-                return bool(next(csv_reader, None))
-        elif file_path.endswith('.xlsx'):
-            df = pd.read_excel(file_path)
-            return len(df) > 0
-        elif file_path.endswith('.json'):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return bool(data)
-    except Exception as e:
-        print(f"Error checking file {file_path}: {str(e)}")
-        return False
-    return False
-
 # Login required decorator
 def login_required(f):
     @functools.wraps(f)
     def decorated_function(*args, **kwargs):
         if 'username' not in session:
-            clear_output_directory()  # Clear data when session expires
             flash('Please login first', 'error')
             return redirect(url_for('login'))
         return f(*args, **kwargs)
@@ -74,7 +130,6 @@ def login_required(f):
 def index():
     if 'username' in session:
         return redirect(url_for('dashboard'))
-    clear_output_directory()  # Clear data when accessing root without session
     return redirect(url_for('login'))
 
 @app.route('/signup', methods=['GET', 'POST'])
@@ -110,9 +165,6 @@ def signup():
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
-    # Clear any existing data when accessing login page
-    clear_output_directory()
-    
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
@@ -134,7 +186,6 @@ def login():
 
 @app.route('/logout')
 def logout():
-    clear_output_directory()  # Clear data on logout
     session.pop('username', None)
     flash('Logged out successfully', 'success')
     return redirect(url_for('login'))
@@ -145,17 +196,16 @@ def dashboard():
     # Ensure output directory exists
     os.makedirs('output', exist_ok=True)
     
-    youtube_files = {
-        'csv': check_file_has_data('output/youtube_videos.csv'),
-        'excel': check_file_has_data('output/youtube_videos.xlsx'),
-        'json': check_file_has_data('output/youtube_videos.json')
-    }
-    amazon_files = {
-        'csv': check_file_has_data('output/amazon_products.csv'),
-        'excel': check_file_has_data('output/amazon_products.xlsx'),
-        'json': check_file_has_data('output/amazon_products.json')
-    }
-    return render_template('dashboard.html', youtube_files=youtube_files, amazon_files=amazon_files)
+    # Read from the small manifests written when each scrape completed
+    youtube_files = results.formats(session['username'], 'youtube')
+    amazon_files = results.formats(session['username'], 'amazon')
+    recent_jobs = [job for job in jobs.jobs_for(session['username']) if not job.batch_id][:5]
+    recent_batches = batches.batches_for(session['username'])[:3]
+    # Cache hits, re-parses and scrapes run with the archive off have no pages to re-parse
+    reparseable = {job.id for job in recent_jobs if archive and archive.has_pages(job.id)}
+    return render_template('dashboard.html', youtube_files=youtube_files, amazon_files=amazon_files,
+                           recent_jobs=recent_jobs, recent_batches=recent_batches, reparseable=reparseable,
+                           batch_max_queries=BATCH_MAX_QUERIES)
 
 @app.route('/blog')
 @login_required
@@ -165,21 +215,32 @@ def blog():
 @app.route('/download/<scraper>/<format>')
 @login_required
 def download_file(scraper, format):
-    if scraper not in ['youtube', 'amazon'] or format not in ['csv', 'excel', 'json']:
+    if scraper not in ['youtube', 'amazon'] or format not in EXPORT_FORMATS:
         flash('Invalid download request', 'error')
         return redirect(url_for('dashboard'))
     
-    filename = f"{scraper}_{'videos' if scraper == 'youtube' else 'products'}.{format}"
-    if format == 'excel':
-        filename = filename.replace('excel', 'xlsx')
-    
-    file_path = os.path.join('output', filename)
-    
-    if not os.path.exists(file_path) or not check_file_has_data(file_path):
+    # The user's latest result, or a specific job of theirs with ?job=<id>
+    started = time.perf_counter()
+    file_path = results.export(session['username'], scraper, format, request.args.get('job'))
+    if not file_path:
         flash('No data available for download', 'error')
         return redirect(url_for('dashboard'))
+    # Text formats go out gzipped to clients that accept it; range requests
+    # (resumed or partial downloads) get the plain file so offsets stay meaningful
+    gzipped = format != 'excel' and request.accept_encodings['gzip'] > 0 and request.range is None
+    if gzipped:
+        file_path = results.compressed(file_path)
+    metrics.observe('export_seconds', time.perf_counter() - started, format=format)
     
-    return send_file(file_path, as_attachment=True)
+    download_name = f"{scraper}_{'videos' if scraper == 'youtube' else 'products'}.{EXPORT_FORMATS[format]}"
+    # conditional: ETag/Last-Modified revalidation and HTTP Range requests
+    response = send_file(file_path, as_attachment=True, download_name=download_name, conditional=True)
+    if gzipped:
+        response.headers['Content-Encoding'] = 'gzip'
+    # Ranges are only served from the plain file, so a gzipped body must not advertise them
+    response.accept_ranges = 'none' if gzipped else 'bytes'
+    response.vary.add('Accept-Encoding')
+    return response
 
 @app.route('/clear/<scraper>', methods=['POST'])
 @login_required
@@ -190,10 +251,7 @@ def clear_data(scraper):
         
     try:
         # Clear files for the specified scraper
-        for ext in ['csv', 'xlsx', 'json']:
-            file_path = f'output/{scraper}_{"videos" if scraper == "youtube" else "products"}.{ext}'
-            if os.path.exists(file_path):
-                os.remove(file_path)
+        results.clear(session['username'], scraper)
         
         flash(f'{scraper.title()} data cleared successfully', 'success')
     except Exception as e:
@@ -201,82 +259,345 @@ def clear_data(scraper):
         
     return redirect(url_for('dashboard'))
 
+# Events that mean a scrape stopped short of its full result, which must not be cached.
+# (An Amazon page that times out is retried, and only counts once it fails for good.)
+INCOMPLETE_EVENTS = {
+    'amazon': ('failed_pages', 'errors'),
+    'youtube': ('timeouts', 'stalled_out'),
+}
+
+def scrape_complete(job):
+    return not any(job.stats.counters.get(event) for event in INCOMPLETE_EVENTS[job.kind])
+
+def run_cached(job, scraper, key, scrape):
+    """Run ``scrape`` unless the same query is cached or already being scraped; returns (rows, cached)."""
+    entry, source = cache.get_or_compute(key, scrape)
+    if source == MISS:
+        return entry.rows, False
+    job.stats.count('cache_hits')
+    with job.stats.time('import'):
+        rows = results.import_ndjson(job.owner, scraper, job.id, entry.path, job.query)
+    job.update_progress(job.pages_total or 1, rows)
+    return rows, True
+
+def run_youtube_job(job, query, max_videos=None, since_date=None, incremental=False):
+    def scrape():
+        # Rows are appended to this job's own results as each scroll batch arrives
+        with TimedSink(results.open_sink(job.owner, 'youtube', job.id, query), job.stats) as sink:
+            scrape_youtube_videos(query, progress=job.update_progress, max_videos=max_videos,
+                                  since_date=since_date, stats=job.stats, sink=sink,
+                                  index=channels if incremental else None,
+                                  archive=archive.recorder(job.id, 'youtube', query) if archive else None)
+        return sink.path('ndjson'), sink.rows_written, scrape_complete(job)
+
+    key = cache_key('youtube', query, max_videos=max_videos,
+                    since_date=since_date.date().isoformat() if since_date else None,
+                    incremental=incremental)
+    rows, cached = run_cached(job, 'youtube', key, scrape)
+
+    if not rows:
+        return 'No videos found'
+    return f"YouTube data scraped successfully. Found {rows} videos.{' (cached result)' if cached else ''}"
+
+def run_amazon_job(job, query, max_pages):
+    def scrape():
+        scraper = AmazonScraper()
+        # Rows are appended to this job's own results, and to the price history, as each page arrives
+        with TimedSink(TeeSink(results.open_sink(job.owner, 'amazon', job.id, query), history.recorder(query)),
+                       job.stats) as sink:
+            scraper.scrape_amazon(query, max_pages, progress=job.update_progress, sink=sink, stats=job.stats,
+                                  archive=archive.recorder(job.id, 'amazon', query) if archive else None)
+        return sink.path('ndjson'), sink.rows_written, scrape_complete(job)
+
+    rows, cached = run_cached(job, 'amazon', cache_key('amazon', query, max_pages=max_pages), scrape)
+
+    if not rows:
+        return 'No products found'
+    return f"Amazon data scraped successfully. Found {rows} products.{' (cached result)' if cached else ''}"
+
+def run_reparse_job(job, source_job_id):
+    with results.open_sink(job.owner, job.kind, job.id, job.query) as sink:
+        pages = reparse_job(archive, source_job_id, sink, workers=int(os.environ.get('REPARSE_WORKERS', 0)) or None)
+    job.update_progress(pages, sink.rows_written)
+    return f'Re-parsed {pages} archived pages. Found {sink.rows_written} items.'
+
+def run_batch_query(job, writer, max_pages, max_videos):
+    archive_recorder = archive.recorder(job.id, job.kind, job.query) if archive else None
+    if job.kind == 'amazon':
+        with TimedSink(TeeSink(writer, history.recorder(job.query)), job.stats) as sink:
+            AmazonScraper().scrape_amazon(job.query, max_pages, progress=job.update_progress, sink=sink,
+                                          stats=job.stats, archive=archive_recorder)
+        noun = 'products'
+    else:
+        with TimedSink(writer, job.stats) as sink:
+            scrape_youtube_videos(job.query, progress=job.update_progress, max_videos=max_videos,
+                                  stats=job.stats, sink=sink, archive=archive_recorder)
+        noun = 'videos'
+    if not sink.rows_written:
+        return f'No {noun} found'
+    return f'Found {sink.rows_written} {noun}.'
+
+def batch_kind(url):
+    """'amazon' or 'youtube' for a URL the batch endpoint accepts, otherwise None."""
+    host = urlparse(url).netloc.lower()
+    if 'amazon.' in host:
+        return 'amazon'
+    if host.endswith('youtube.com') or host == 'youtu.be':
+        return 'youtube'
+    return None
+
+def urls_from_csv(text):
+    """URLs from an uploaded CSV: its ``url`` column if it has a header naming one, else the first column."""
+    rows = [row for row in csv.reader(io.StringIO(text)) if row]
+    column = 0
+    if rows:
+        header = [cell.strip().lower() for cell in rows[0]]
+        if 'url' in header:
+            column = header.index('url')
+            rows = rows[1:]
+    return [row[column] for row in rows if len(row) > column]
+
+def submit_batch(owner, urls, max_pages, max_videos):
+    batch_id = uuid.uuid4().hex
+    kinds = {batch_kind(url) for url in urls}
+    # Every query's rows go into one result per scraper, tagged with the query they came from
+    shared = {kind: SharedSink(results.open_sink(owner, kind, batch_id, f'Batch of {len(urls)} queries',
+                                                 fieldnames=['query'] + SCRAPERS[kind][1]))
+              for kind in kinds}
+
+    def scrape(url):
+        return lambda job: run_batch_query(job, shared[job.kind].writer(query=url), max_pages, max_videos)
+
+    def finish(batch):
+        for sink in shared.values():
+            sink.close()
+
+    items = [(batch_kind(url), url, scrape(url), max_pages if batch_kind(url) == 'amazon' else None)
+             for url in urls]
+    return batches.submit(owner, items, on_done=finish, batch_id=batch_id)
+
 @app.route('/scrape/youtube', methods=['POST'])
 @login_required
 def scrape_youtube():
     query = request.form.get('query', '')
     try:
-        # Clear previous data
-        for ext in ['csv', 'xlsx', 'json']:
-            file_path = f'output/youtube_videos.{ext}'
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                
-        videos = scrape_youtube_videos(query)
-        
-        if not videos:
-            flash('No videos found', 'error')
-            return redirect(url_for('dashboard'))
-        
-        # Ensure output directory exists
-        os.makedirs('output', exist_ok=True)
-        
-        # Save as CSV
-        with open('output/youtube_videos.csv', 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=['title', 'views', 'upload_date'])
-            writer.writeheader()
-            writer.writerows(videos)
-        
-        # Save as Excel
-        df = pd.DataFrame(videos)
-        df.to_excel('output/youtube_videos.xlsx', index=False)
-        
-        # Save as JSON
-        with open('output/youtube_videos.json', 'w', encoding='utf-8') as f:
-            json.dump(videos, f, indent=2)
-            
-        flash('YouTube data scraped successfully', 'success')
-    except Exception as e:
-        flash(f'Error scraping YouTube data: {str(e)}', 'error')
+        max_videos = int(request.form.get('max_videos') or 0) or None
+    except ValueError:
+        flash('Max videos must be a number', 'error')
+        return redirect(url_for('dashboard'))
+    since_date = request.form.get('since_date')
+    try:
+        since_date = datetime.strptime(since_date, '%Y-%m-%d') if since_date else None
+    except ValueError:
+        flash('Invalid date, expected YYYY-MM-DD', 'error')
+        return redirect(url_for('dashboard'))
+    incremental = bool(request.form.get('incremental'))
+    jobs.submit('youtube', session['username'], query,
+                lambda job: run_youtube_job(job, query, max_videos, since_date, incremental))
+    flash('YouTube scrape queued. Progress is shown below.', 'success')
     return redirect(url_for('dashboard'))
 
 @app.route('/scrape/amazon', methods=['POST'])
 @login_required
 def scrape_amazon():
     query = request.form.get('query', '')
-    max_pages = min(int(request.form.get('max_pages', 1)), 20)  # Limit to 20 pages
-    
     try:
-        # Clear previous data
-        for ext in ['csv', 'xlsx', 'json']:
-            file_path = f'output/amazon_products.{ext}'
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                
-        scraper = AmazonScraper()
-        products = scraper.scrape_amazon(query, max_pages)
-        
-        if not products:
-            flash('No products found', 'error')
-            return redirect(url_for('dashboard'))
-            
-        # Save as CSV
-        df = pd.DataFrame([p.__dict__ for p in products])
-        df.to_csv('output/amazon_products.csv', index=False)
-        
-        # Save as Excel
-        df.to_excel('output/amazon_products.xlsx', index=False)
-        
-        # Save as JSON
-        with open('output/amazon_products.json', 'w', encoding='utf-8') as f:
-            json.dump([p.__dict__ for p in products], f, indent=2)
-            
-        flash(f'Amazon data scraped successfully. Found {len(products)} products.', 'success')
-    except Exception as e:
-        flash(f'Error scraping Amazon data: {str(e)}', 'error')
+        max_pages = min(int(request.form.get('max_pages') or 1), 20)  # Limit to 20 pages
+    except ValueError:
+        flash('Max pages must be a number', 'error')
+        return redirect(url_for('dashboard'))
+    jobs.submit('amazon', session['username'], query,
+                lambda job: run_amazon_job(job, query, max_pages), pages_total=max_pages)
+    flash('Amazon scrape queued. Progress is shown below.', 'success')
     return redirect(url_for('dashboard'))
 
+def batch_error(message):
+    if request.is_json:
+        return jsonify({'error': message}), 400
+    flash(message, 'error')
+    return redirect(url_for('dashboard'))
+
+@app.route('/scrape/batch', methods=['POST'])
+@login_required
+def scrape_batch():
+    # A JSON body {"urls": [...], "max_pages": n, "max_videos": n}, or the dashboard form and CSV upload
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return batch_error('The JSON body must be an object with a urls list')
+    else:
+        data = request.form
+    lines = data.get('urls') or []
+    if not isinstance(lines, (str, list)):
+        return batch_error('urls must be a list of URLs, or a string with one URL per line')
+    lines = lines.splitlines() if isinstance(lines, str) else list(lines)
+    upload = request.files.get('file')
+    if upload and upload.filename:
+        try:
+            lines += urls_from_csv(upload.read().decode('utf-8-sig'))
+        except (UnicodeDecodeError, csv.Error) as e:
+            return batch_error(f'Could not read the CSV file: {e}')
+    lines = (str(line).strip() for line in lines)
+    urls = list(dict.fromkeys(line for line in lines if line and not line.startswith('#')))
+    invalid = [url for url in urls if batch_kind(url) is None]
+    if invalid:
+        return batch_error(f"Not an Amazon or YouTube URL: {', '.join(invalid[:5])}{' ...' if len(invalid) > 5 else ''}")
+    if not urls:
+        return batch_error('No URLs to scrape')
+    if len(urls) > BATCH_MAX_QUERIES:
+        return batch_error(f'A batch can have at most {BATCH_MAX_QUERIES} URLs, got {len(urls)}')
+    try:
+        max_pages = min(int(data.get('max_pages') or 1), 20)  # Limit to 20 pages
+        max_videos = int(data.get('max_videos') or 0) or None
+    except (TypeError, ValueError):
+        return batch_error('max_pages and max_videos must be numbers')
+
+    batch = submit_batch(session['username'], urls, max_pages, max_videos)
+    if request.is_json:
+        return jsonify(batch_status(batch)), 202
+    flash(f'Batch of {len(urls)} queries queued. Progress is shown below.', 'success')
+    return redirect(url_for('dashboard'))
+
+def batch_status(batch):
+    status = batch.to_dict()
+    kinds = sorted({item.kind for item in batch.items})
+    status['downloads'] = {kind: {fmt: url_for('download_file', scraper=kind, format=fmt, job=batch.id)
+                                  for fmt in EXPORT_FORMATS}
+                           for kind in kinds if batch.finished and results.has_data(batch.owner, kind, batch.id)}
+    return status
+
+@app.route('/batches')
+@login_required
+def list_batches():
+    return jsonify([batch_status(batch) for batch in batches.batches_for(session['username'])])
+
+@app.route('/batches/<batch_id>')
+@login_required
+def batch_detail(batch_id):
+    batch = batches.get(batch_id)
+    if batch is None or batch.owner != session['username']:
+        abort(404)
+    return jsonify(batch_status(batch))
+
+@app.route('/jobs')
+@login_required
+def list_jobs():
+    return jsonify([job.to_dict() for job in jobs.jobs_for(session['username'])])
+
+@app.route('/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None or job.owner != session['username']:
+        abort(404)
+    return jsonify(job.to_dict())
+
+@app.route('/api/results/<scraper>')
+@login_required
+def results_page(scraper):
+    if scraper not in SCRAPERS:
+        abort(404)
+    try:
+        page = results.preview(session['username'], scraper, request.args, request.args.get('job'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if page is None:
+        abort(404)
+    return jsonify(page)
+
+@app.route('/results/<scraper>')
+@login_required
+def preview_results(scraper):
+    if scraper not in SCRAPERS:
+        abort(404)
+    try:
+        page = results.preview(session['username'], scraper, request.args, request.args.get('job'))
+    except ValueError as e:
+        flash(f'Invalid filter: {e}', 'error')
+        return redirect(url_for('preview_results', scraper=scraper, job=request.args.get('job')))
+    if page is None:
+        flash('No data available to preview', 'error')
+        return redirect(url_for('dashboard'))
+    # The query string minus names url_for would take as its own arguments
+    args = {name: value for name, value in request.args.items() if name != 'scraper' and not name.startswith('_')}
+    def page_url(**changes):
+        # The current filters and sort, with some of them changed
+        return url_for('preview_results', scraper=scraper, **{**args, **changes})
+
+    return render_template('results.html', scraper=scraper, page=page, args=args, page_url=page_url,
+                           sorts=PREVIEW_SORTS[scraper])
+
+@app.route('/jobs/<job_id>/timeline')
+@login_required
+def job_timeline(job_id):
+    job = jobs.get(job_id)
+    if job is None or job.owner != session['username']:
+        abort(404)
+    spans = job.stats.timeline()
+    if request.args.get('format') == 'json':
+        return jsonify({'job': job.to_dict(), 'spans': spans})
+    # One lane per thread, in the order the threads first did something
+    lanes = {}
+    for span in spans:
+        lanes.setdefault(span['thread'], []).append(span)
+    total = max((s['start'] + s['seconds'] for s in spans), default=0)
+    stages = sorted(job.stats.to_dict()['timings'].items(), key=lambda item: -item[1])
+    return render_template('timeline.html', job=job, lanes=lanes, total=total or 1, stages=stages)
+
+@app.route('/api/history/drops')
+@login_required
+def history_drops():
+    limit = max(1, min(request.args.get('limit', 20, type=int), 200))
+    days = request.args.get('days', type=float)
+    since = datetime.now().timestamp() - days * 86400 if days else None
+    return jsonify(history.biggest_drops(limit=limit, since=since))
+
+@app.route('/api/history/trends')
+@login_required
+def history_trends():
+    query = request.args.get('query', '')
+    if not query:
+        return jsonify({'error': 'query is required'}), 400
+    return jsonify(history.trends(query, days=request.args.get('days', 30, type=int)))
+
+@app.route('/api/history/<asin>')
+@login_required
+def price_history(asin):
+    product = history.price_history(asin, limit=max(1, min(request.args.get('limit', 500, type=int), 5000)))
+    if product is None:
+        abort(404)
+    return jsonify(product)
+
+@app.route('/jobs/<job_id>/reparse', methods=['POST'])
+@login_required
+def reparse(job_id):
+    first = next(archive.pages(job_id=job_id), None) if archive else None
+    # Only the owner of the original results may re-parse them
+    if first is None or results.manifest(session['username'], first.kind, job_id) is None:
+        flash('This scrape has no archived pages to re-parse', 'error')
+        return redirect(url_for('dashboard'))
+    jobs.submit(first.kind, session['username'], first.query,
+                lambda job: run_reparse_job(job, job_id))
+    flash('Re-parsing the archived pages. Progress is shown below.', 'success')
+    return redirect(url_for('dashboard'))
+
+@app.route('/stats')
+@login_required
+def stats():
+    job_counts = {}
+    for job in jobs.all_jobs():
+        job_counts[job.status] = job_counts.get(job.status, 0) + 1
+    return jsonify({'cache': cache.stats(), 'jobs': job_counts})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    # Scraped by Prometheus, which does not log in
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     # Ensure output directory exists
     os.makedirs('output', exist_ok=True)
+    if os.environ.get('DRIVER_POOL_WARM'):
+        # Start the browsers in the background so the first scrape skips the cold start
+        threading.Thread(target=get_default_pool().warm, daemon=True).start()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""Insert rate and lookup latency of the price history store at scale.
+
+Run from the app directory:
+
+    python -m benchmarks.bench_history [--rows 1000000] [--products 20000] [--db path]
+
+Rows are written the way scrapes write them, one 48-product page per
+transaction, spread over a number of days and queries. Each lookup is then
+timed over many random products and the median and worst case reported.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from history import PriceHistory
+
+PAGE_SIZE = 48
+QUERIES = [f"https://www.amazon.in/s?k=benchmark+{n}" for n in range(20)]
+
+
+def asin(n):
+    return f"B{n:09d}"
+
+
+def fill(history, rows, products, days):
+    rng = random.Random(1)
+    pages = rows // PAGE_SIZE
+    started = time.perf_counter()
+    now = time.time()
+    for page in range(pages):
+        observed_at = now - days * 86400 * (1 - page / pages)
+        batch = []
+        for _ in range(PAGE_SIZE):
+            n = rng.randrange(products)
+            batch.append({
+                'title': f"Product {n}",
+                'price': str(1000 + (n % 500) * 10 - rng.randrange(0, 200)),
+                'rating': f"{3 + (n % 20) / 10:.1f}",
+                'reviews': f"{n % 5000:,}",
+                'url': f"https://www.amazon.in/product-{n}/dp/{asin(n)}",
+            })
+        history.record(QUERIES[page % len(QUERIES)], batch, observed_at)
+    elapsed = time.perf_counter() - started
+    return {'rows': pages * PAGE_SIZE, 'seconds': round(elapsed, 2),
+            'rows_per_sec': round(pages * PAGE_SIZE / elapsed, 1)}
+
+
+def timed(func, args_list):
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {'calls': len(samples), 'median_ms': round(statistics.median(samples), 3), 'max_ms': round(max(samples), 3)}
+
+
+def run(rows, products, days, db=None):
+    path = db or os.path.join(tempfile.mkdtemp(), 'history.db')
+    history = PriceHistory(path)
+    results = {'insert': fill(history, rows, products, days)}
+
+    rng = random.Random(2)
+    results['price_history'] = timed(history.price_history, [(asin(rng.randrange(products)),) for _ in range(200)])
+    results['biggest_drops'] = timed(history.biggest_drops, [(20,), (20, time.time() - 86400)] * 20)
+    results['trends'] = timed(history.trends, [(q, days) for q in QUERIES] * 2)
+    results['db_mb'] = round(os.path.getsize(path) / 1024 / 1024, 1)
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--rows', type=int, default=1000000)
+    arg_parser.add_argument('--products', type=int, default=20000)
+    arg_parser.add_argument('--days', type=int, default=90)
+    arg_parser.add_argument('--db', help="database to fill (a temporary one by default)")
+    arg_parser.add_argument('--json', action='store_true', help="print machine-readable results")
+    args = arg_parser.parse_args()
+
+    results = run(args.rows, args.products, args.days, args.db)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    insert = results['insert']
+    print(f"insert: {insert['rows_per_sec']:>10,.0f} rows/s  ({insert['rows']:,} rows in {insert['seconds']}s, "
+          f"{results['db_mb']} MB)")
+    for name in ('price_history', 'biggest_drops', 'trends'):
+        r = results[name]
+        print(f"{name}: median {r['median_ms']} ms, max {r['max_ms']} ms over {r['calls']} calls")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Rows/second for typing scraped fields, vectorized versus one row at a time.
+
+Run from the app directory:
+
+    python -m benchmarks.bench_normalize [--rows 1000000]
+
+Synthetic Amazon and YouTube rows are typed with scrapers.normalize and
+with a plain per-row regex loop; both must give the same values.
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+import pandas as pd
+
+from scrapers.normalize import normalize_products, normalize_videos, _SCALE, _UNIT_SECONDS
+
+NOW = 1700000000.0
+_NUMBER = re.compile(r'(\d+(?:\.\d+)?)')
+_COUNT = re.compile(r'(\d+(?:\.\d+)?)\s*(K|M|B|LAKH|CRORE)?')
+_AGO = re.compile(r'(\d+)\s+(second|minute|hour|day|week|month|year)s?\s+ago')
+
+
+def synthetic_products(n, seed=1):
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        'price': [f"{rng.randrange(99, 99999):,}" if rng.random() > 0.05 else None for _ in range(n)],
+        'rating': [f"{rng.uniform(1, 5):.1f} out of 5 stars" if rng.random() > 0.1 else None for _ in range(n)],
+        'reviews': [rng.choice([f"{rng.randrange(1, 99999):,}", f"({rng.randrange(1, 99)}.{rng.randrange(10)}K)", None])
+                    for _ in range(n)],
+    })
+
+
+def synthetic_videos(n, seed=2):
+    rng = random.Random(seed)
+    units = list(_UNIT_SECONDS)
+    return pd.DataFrame({
+        'views': [rng.choice([f"{rng.randrange(1, 999)} views", f"{rng.randrange(1, 99)}.{rng.randrange(10)}K views",
+                              f"{rng.randrange(1, 9)}.{rng.randrange(10)}M views", "No views"]) for _ in range(n)],
+        'upload_date': [f"{rng.randrange(1, 12)} {rng.choice(units)}s ago" for _ in range(n)],
+    })
+
+
+def _number(text):
+    match = _NUMBER.search(str(text).replace(',', '')) if text is not None else None
+    return float(match.group(1)) if match else None
+
+
+def _count(text):
+    if text is None:
+        return None
+    if text.startswith('No view'):
+        return 0
+    match = _COUNT.search(text.replace(',', '').upper())
+    return round(float(match.group(1)) * _SCALE[match.group(2) or '']) if match else None
+
+
+def _ago(text):
+    match = _AGO.search(text or '')
+    return round(NOW - int(match.group(1)) * _UNIT_SECONDS[match.group(2)]) if match else None
+
+
+def rowwise_products(df):
+    out = []
+    for price, rating, reviews in zip(df['price'], df['rating'], df['reviews']):
+        price = _number(price)
+        out.append((round(price * 100) if price is not None else None, _number(rating), _count(reviews)))
+    return out
+
+
+def rowwise_videos(df):
+    return [(_count(views), _ago(uploaded)) for views, uploaded in zip(df['views'], df['upload_date'])]
+
+
+def _as_tuples(df, columns):
+    typed = df[columns].astype(object)
+    return list(typed.where(typed.notna(), None).itertuples(index=False, name=None))
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def run(rows):
+    results = {}
+    cases = [
+        ('amazon', synthetic_products(rows), lambda df: normalize_products(df), rowwise_products,
+         ['price_paise', 'rating_value', 'review_count']),
+        ('youtube', synthetic_videos(rows), lambda df: normalize_videos(df, NOW), rowwise_videos,
+         ['view_count', 'upload_ts']),
+    ]
+    for name, df, vectorized, rowwise, columns in cases:
+        typed, vector_seconds = _timed(vectorized, df)
+        expected, row_seconds = _timed(rowwise, df)
+        if _as_tuples(typed, columns) != expected:
+            raise SystemExit(f"{name}: vectorized and row-wise results differ")
+        results[name] = {
+            'rows': rows,
+            'vectorized_rows_per_sec': round(rows / vector_seconds),
+            'rowwise_rows_per_sec': round(rows / row_seconds),
+            'speedup': round(row_seconds / vector_seconds, 2),
+        }
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--rows', type=int, default=1000000)
+    arg_parser.add_argument('--json', action='store_true', help="print machine-readable results")
+    args = arg_parser.parse_args()
+
+    results = run(args.rows)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, r in results.items():
+        print(f"{name:>8}: vectorized {r['vectorized_rows_per_sec']:>12,} rows/s  "
+              f"row-wise {r['rowwise_rows_per_sec']:>12,} rows/s  ({r['speedup']}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Items/second for each Amazon parser engine over saved search result pages.
+
+Run from the app directory:
+
+    python -m benchmarks.bench_parsers [page.html ...] [--repeat 5]
+
+Without page arguments the pages in benchmarks/fixtures/amazon are used.
+Every engine must produce exactly the same products as the BeautifulSoup one.
+"""
+import argparse
+import json
+import time
+
+from benchmarks.fixtures import amazon_fixture_paths
+from scrapers.amazon_parsers import PARSERS
+
+BASE_URL = "https://www.amazon.in"
+
+
+def run(paths, repeat=5):
+    pages = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+
+    results = {}
+    reference = None
+    for name, engine in PARSERS.items():
+        try:
+            parser = engine()
+        except ImportError as e:
+            print(f"{name}: skipped ({e})")
+            continue
+
+        parsed = [parser.parse(html, BASE_URL) for html in pages]
+        if reference is None:
+            reference = parsed
+        elif parsed != reference:
+            raise SystemExit(f"{name} output differs from {next(iter(results))}")
+
+        items = sum(len(page.products) for page in parsed)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for html in pages:
+                parser.parse(html, BASE_URL)
+        elapsed = time.perf_counter() - started
+        results[name] = {
+            'pages': len(pages) * repeat,
+            'items': items * repeat,
+            'seconds': round(elapsed, 4),
+            'items_per_sec': round(items * repeat / elapsed, 1),
+            'pages_per_sec': round(len(pages) * repeat / elapsed, 2),
+        }
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('pages', nargs='*', help="saved search result pages")
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--json', action='store_true', help="print machine-readable results")
+    args = arg_parser.parse_args()
+
+    results = run(args.pages or amazon_fixture_paths(), repeat=args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, result in results.items():
+        print(f"{name:>6}: {result['items_per_sec']:>10,.0f} items/s  "
+              f"{result['pages_per_sec']:>8,.2f} pages/s  ({result['items']} items in {result['seconds']}s)")
+
+
+if __name__ == '__main__':
+    main()
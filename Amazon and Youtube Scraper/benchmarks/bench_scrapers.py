@@ -0,0 +1,305 @@
+"""End-to-end throughput of both scrapers against a local stub server.
+
+Run from the app directory:
+
+    python -m benchmarks.bench_scrapers [--pages 10] [--json] [--out run.json] [--compare baseline.json]
+
+AmazonScraper is driven over HTTP (or Chrome with --fetch-mode browser) and
+scrape_youtube_videos through Chrome, both against fixture pages served on
+127.0.0.1, with rows going through the same result sink the app uses. Then
+the Amazon rows are exported to every download format. Each section reports
+throughput, peak RSS (this process plus any browsers) and the time split
+from ScrapeStats, summed over worker threads so it can exceed wall time.
+The YouTube section is skipped if Chrome cannot start.
+
+--compare prints the change from an earlier --out file and exits with
+status 1 if any throughput fell, or peak RSS grew, by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import psutil
+
+from benchmarks.fixtures import AMAZON_DIR, YOUTUBE_DIR, amazon_search_page, youtube_channel_page
+from benchmarks.stub_server import StubServer
+from results import ResultStore, SCRAPERS
+from scrapers.amazon_scraper import AmazonScraper
+from scrapers.driver_pool import DriverPool, RESOURCE_POLICIES
+from scrapers.export import ExportSink, convert_ndjson, iter_ndjson
+from scrapers.http_fetcher import HttpFetcher
+from scrapers.rate_limit import HostRateLimiter
+from scrapers.stats import ScrapeStats
+from scrapers.youtube_scraper import scrape_youtube_videos
+
+EXPORT_FORMATS = ('csv', 'json', 'xlsx')
+# Metrics where a bigger number is better; everything else compared is better smaller
+THROUGHPUT_METRICS = ('pages_per_sec', 'items_per_sec', 'rows_per_sec')
+
+
+class PeakRss:
+    """Samples the RSS of this process and its children (the browsers) on a background thread."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        process = psutil.Process()
+        while True:
+            total = 0
+            for proc in [process] + process.children(recursive=True):
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.peak = max(self.peak, total)
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def peak_mb(self) -> float:
+        return round(self.peak / 1024 / 1024, 1)
+
+
+def amazon_pages(pages):
+    """Page number -> HTML: the saved pages in benchmarks/fixtures/amazon if there are any, else synthetic ones."""
+    if os.path.isdir(AMAZON_DIR):
+        saved = sorted(name for name in os.listdir(AMAZON_DIR) if name.endswith('.html'))
+        # Synthetic pages written by bench_parsers link to 20 pages, so they are regenerated to fit
+        if saved and not all(name.startswith('search_page_') for name in saved):
+            result = {}
+            for page_no, name in enumerate(saved[:pages], start=1):
+                with open(os.path.join(AMAZON_DIR, name), encoding='utf-8') as f:
+                    result[page_no] = f.read()
+            return result
+    return {n: amazon_search_page(n, last_page=pages) for n in range(1, pages + 1)}
+
+
+def youtube_page(args):
+    """A saved benchmarks/fixtures/youtube/channel.html if there is one, else a synthetic channel."""
+    saved = os.path.join(YOUTUBE_DIR, 'channel.html')
+    if os.path.exists(saved):
+        with open(saved, encoding='utf-8') as f:
+            return f.read()
+    return youtube_channel_page(videos=args.videos, batch=args.batch, delay_ms=args.scroll_delay_ms)
+
+
+def bench_amazon(server, store, args):
+    stats = ScrapeStats()
+    pool = DriverPool(max_size=args.concurrency, block=args.block, page_load_strategy=args.page_load)
+    scraper = AmazonScraper(pool=pool, concurrency=args.concurrency,
+                            rate_limiter=HostRateLimiter(min_interval=args.min_interval, jitter=0),
+                            fetch_mode=args.fetch_mode, http_fetcher=HttpFetcher(pool_size=args.concurrency),
+                            parser=args.parser)
+    try:
+        with PeakRss() as rss, store.open_sink('bench', 'amazon', 'amazon') as sink:
+            started = time.perf_counter()
+            scraper.scrape_amazon(server.amazon_url(), args.pages, sink=sink, stats=stats)
+            elapsed = time.perf_counter() - started
+    finally:
+        pool.close()
+    pages = stats.counters.get('pages', 0)
+    return {
+        'fetch_mode': args.fetch_mode,
+        'parser': scraper.parser.name,
+        'concurrency': args.concurrency,
+        'pages': pages,
+        'items': sink.rows_written,
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(pages / elapsed, 2),
+        'items_per_sec': round(sink.rows_written / elapsed, 1),
+        'peak_rss_mb': rss.peak_mb,
+        **stats.to_dict(),
+    }
+
+
+def bench_youtube(server, store, args):
+    pool = DriverPool(max_size=1, block=args.block, page_load_strategy=args.page_load)
+    try:
+        pool.warm(1)  # Browser start-up is not part of the scrape being measured
+    except Exception as e:
+        pool.close()
+        return {'skipped': f"Chrome unavailable: {str(e).splitlines()[0] if str(e) else type(e).__name__}"}
+
+    stats = ScrapeStats()
+    try:
+        with PeakRss() as rss, store.open_sink('bench', 'youtube', 'youtube') as sink:
+            started = time.perf_counter()
+            scrape_youtube_videos(server.youtube_url(), pool=pool, stats=stats, sink=sink)
+            elapsed = time.perf_counter() - started
+    finally:
+        pool.close()
+    scrolls = stats.counters.get('scrolls', 0)
+    return {
+        'scrolls': scrolls,
+        'items': sink.rows_written,
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(scrolls / elapsed, 2),
+        'items_per_sec': round(sink.rows_written / elapsed, 1),
+        'peak_rss_mb': rss.peak_mb,
+        **stats.to_dict(),
+    }
+
+
+def bench_exports(source, workdir, rows):
+    """Grow the scraped rows to ``rows`` and time writing them in each format."""
+    sample = list(iter_ndjson(source))
+    if not sample:
+        return {'skipped': 'no rows scraped'}
+    fieldnames = SCRAPERS['amazon'][1]
+    data = [sample[i % len(sample)] for i in range(rows)]
+
+    results = {}
+    started = time.perf_counter()
+    with ExportSink(os.path.join(workdir, 'canonical'), fieldnames, formats=('ndjson',)) as sink:
+        for i in range(0, rows, 1000):
+            sink.write(data[i:i + 1000])
+    elapsed = time.perf_counter() - started
+    canonical = sink.path('ndjson')
+    results['ndjson'] = {'rows': rows, 'seconds': round(elapsed, 3), 'rows_per_sec': round(rows / elapsed),
+                         'size_mb': round(os.path.getsize(canonical) / 1024 / 1024, 2)}
+
+    for fmt in EXPORT_FORMATS:
+        with PeakRss() as rss:
+            started = time.perf_counter()
+            path = convert_ndjson(canonical, os.path.join(workdir, f'export-{fmt}'), fmt, fieldnames)
+            elapsed = time.perf_counter() - started
+        results[fmt] = {'rows': rows, 'seconds': round(elapsed, 3), 'rows_per_sec': round(rows / elapsed),
+                        'size_mb': round(os.path.getsize(path) / 1024 / 1024, 2), 'peak_rss_mb': rss.peak_mb}
+    return results
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='bench-scrapers-')
+    store = ResultStore(os.path.join(workdir, 'output'))
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'started_at': time.time(),
+            'args': vars(args),
+        },
+    }
+    try:
+        with StubServer(amazon_pages(args.pages), youtube_page(args), latency=args.latency) as server:
+            results['amazon'] = bench_amazon(server, store, args)
+            results['youtube'] = bench_youtube(server, store, args) if args.youtube else {'skipped': '--no-youtube'}
+        results['export'] = bench_exports(store.canonical_path('bench', 'amazon', 'amazon'), workdir, args.export_rows)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def _metrics(results):
+    """Flatten to {'amazon.pages_per_sec': ...} for the numbers worth comparing."""
+    flat = {}
+    for section, values in results.items():
+        if section == 'meta' or 'skipped' in values:
+            continue
+        nested = values.items() if section == 'export' else [(None, values)]
+        for name, group in nested:
+            prefix = f"{section}.{name}" if name else section
+            for key in THROUGHPUT_METRICS + ('peak_rss_mb',):
+                if key in group:
+                    flat[f"{prefix}.{key}"] = group[key]
+    return flat
+
+
+def compare(baseline, current, threshold):
+    """Print each metric's change from ``baseline``; returns the names that regressed."""
+    before, after = _metrics(baseline), _metrics(current)
+    regressions = []
+    for name in sorted(after):
+        if name not in before or not before[name]:
+            continue
+        change = (after[name] - before[name]) / before[name]
+        worse = -change if name.endswith(THROUGHPUT_METRICS) else change
+        flag = ''
+        if worse > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<40} {before[name]:>12,} -> {after[name]:>12,}  {change:+.1%}{flag}")
+    return regressions
+
+
+def _print(results):
+    amazon = results['amazon']
+    print(f"amazon:  {amazon['pages']} pages, {amazon['items']} items in {amazon['seconds']}s  "
+          f"({amazon['pages_per_sec']} pages/s, {amazon['items_per_sec']} items/s, peak RSS {amazon['peak_rss_mb']} MB)")
+    print(f"         time: {amazon['timings']}  counters: {amazon['counters']}")
+    youtube = results['youtube']
+    if 'skipped' in youtube:
+        print(f"youtube: skipped ({youtube['skipped']})")
+    else:
+        print(f"youtube: {youtube['items']} videos, {youtube['scrolls']} scrolls in {youtube['seconds']}s  "
+              f"({youtube['items_per_sec']} items/s, peak RSS {youtube['peak_rss_mb']} MB)")
+        print(f"         time: {youtube['timings']}  counters: {youtube['counters']}")
+    for fmt, export in results['export'].items():
+        if fmt == 'skipped':
+            print(f"export:  skipped ({export})")
+            continue
+        print(f"export {fmt:>6}: {export['rows_per_sec']:>10,} rows/s  ({export['rows']:,} rows in "
+              f"{export['seconds']}s, {export['size_mb']} MB)")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--pages', type=int, default=10, help="Amazon result pages to scrape")
+    arg_parser.add_argument('--concurrency', type=int, default=2)
+    arg_parser.add_argument('--fetch-mode', default='http', choices=('http', 'browser', 'auto'))
+    arg_parser.add_argument('--parser', default=None, help="Amazon parser engine (lxml or soup)")
+    arg_parser.add_argument('--block', default='strict', choices=tuple(RESOURCE_POLICIES),
+                            help="resources the browsers block")
+    arg_parser.add_argument('--page-load', default='eager', choices=('eager', 'normal'),
+                            help="browser page load strategy")
+    arg_parser.add_argument('--min-interval', type=float, default=0.2, help="rate limiter spacing per host, seconds")
+    arg_parser.add_argument('--latency', type=float, default=0.05, help="stub server delay per response, seconds")
+    arg_parser.add_argument('--videos', type=int, default=300, help="videos on the YouTube channel page")
+    arg_parser.add_argument('--batch', type=int, default=30, help="videos loaded per scroll")
+    arg_parser.add_argument('--scroll-delay-ms', type=int, default=150)
+    arg_parser.add_argument('--no-youtube', dest='youtube', action='store_false')
+    arg_parser.add_argument('--export-rows', type=int, default=50000)
+    arg_parser.add_argument('--json', action='store_true', help="print machine-readable results")
+    arg_parser.add_argument('--out', help="also write the JSON results to this file")
+    arg_parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    arg_parser.add_argument('--threshold', type=float, default=0.1, help="allowed fractional regression")
+    args = arg_parser.parse_args()
+
+    results = run(args)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print(results)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare}:")
+        if compare(baseline, results, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
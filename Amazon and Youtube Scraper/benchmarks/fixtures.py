@@ -0,0 +1,163 @@
+"""Synthetic HTML fixtures shaped like the pages the scrapers read.
+
+The markup copies the structure the extractors rely on (result cards,
+price/rating/review spans, sponsored labels, pagination bar, video renderers
+loaded in batches on scroll) plus enough filler to give the parsers
+realistically sized pages. Real saved pages can be
+dropped into the fixture directories instead; the benchmarks read whatever
+``*.html`` files they find there.
+"""
+import json
+import os
+import random
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+AMAZON_DIR = os.path.join(FIXTURE_DIR, 'amazon')
+YOUTUBE_DIR = os.path.join(FIXTURE_DIR, 'youtube')
+
+_FILLER = ''.join(
+    f'<div class="a-section a-spacing-none"><span class="a-size-small a-color-base">Option {i}</span>'
+    f'<!-- filler {i} --><i class="a-icon a-icon-prime"></i></div>'
+    for i in range(6))
+
+
+def amazon_card(page_no, index, rng):
+    asin = f"B0{page_no:03d}{index:05d}"
+    sponsored = index % 7 == 0
+    price = rng.randint(199, 199999)
+    return f'''
+<div data-asin="{asin}" data-index="{index}" data-component-type="s-search-result" class="sg-col-4-of-24 s-result-item s-asin sg-col-4-of-12">
+  <div class="sg-col-inner"><div class="s-widget-container s-spacing-small s-widget-container-height-small">
+    <div class="puis-card-container s-card-container">
+      {'<div class="a-row a-spacing-micro"><span class="a-declarative"><span class="a-color-secondary">Sponsored</span></span></div>' if sponsored else ''}
+      <div class="s-product-image-container"><a class="a-link-normal s-no-outline" href="/dp/{asin}?ref=img"><img class="s-image" src="https://m.media-amazon.com/images/I/{asin}.jpg" alt=""></a></div>
+      <div class="a-section a-spacing-none puis-padding-right-small s-title-instructions-style">
+        <h2 class="a-size-mini a-spacing-none a-color-base s-line-clamp-2">
+          <a class="a-link-normal s-underline-text s-underline-link-text s-link-style a-text-normal" href="/Product-Name-{page_no}-{index}/dp/{asin}/ref=sr_1_{index}?keywords=laptop&amp;qid=1">
+            <span class="a-size-medium a-color-base a-text-normal">Product {page_no}-{index} &amp; Laptop 15.6&quot; FHD, {rng.choice([8, 16, 32])}GB RAM</span>
+          </a>
+        </h2>
+      </div>
+      <div class="a-section a-spacing-none a-spacing-top-micro">
+        <div class="a-row a-size-small">
+          <span aria-label="{rng.randint(30, 50) / 10} out of 5 stars"><span class="a-declarative"><a class="a-popover-trigger a-declarative" href="javascript:void(0)"><i class="a-icon a-icon-star-small a-star-small-4"><span class="a-icon-alt">{rng.randint(30, 50) / 10} out of 5 stars</span></i></a></span></span>
+          <span aria-label="{rng.randint(1, 90000):,}"><a class="a-link-normal s-underline-text s-underline-link-text s-link-style" href="/dp/{asin}#customerReviews"><span class="a-size-base s-underline-text">({rng.randint(1, 90000):,})</span></a></span>
+        </div>
+      </div>
+      {'<div class="a-row"><span class="a-badge"><span class="a-badge-label"><span class="a-badge-text" data-a-badge-color="sx-white">Limited time deal</span></span></span></div>' if index % 5 == 0 else ''}
+      <div class="a-row a-size-base a-color-base"><a class="a-link-normal s-no-hover s-underline-text s-underline-link-text s-link-style a-text-normal" href="/dp/{asin}">
+        <span class="a-price" data-a-size="xl" data-a-color="base"><span class="a-offscreen">&#8377;{price:,}</span><span aria-hidden="true"><span class="a-price-symbol">&#8377;</span><span class="a-price-whole">{price:,}</span></span></span></a>
+      </div>
+      <div class="a-row a-size-base a-color-secondary s-align-children-center"><span aria-label="FREE delivery"><span class="a-color-base">FREE delivery </span><span class="a-color-base a-text-bold">{rng.choice(['Tomorrow', 'Sat, 12 Oct', 'Mon, 14 Oct'])}</span></span></div>
+      {_FILLER}
+    </div>
+  </div></div>
+</div>'''
+
+
+def amazon_search_page(page_no, last_page=20, items=48, query='laptop', seed=0):
+    rng = random.Random(seed * 1000 + page_no)
+    cards = ''.join(amazon_card(page_no, i, rng) for i in range(items))
+    pages = ''.join(
+        f'<span class="s-pagination-item s-pagination-selected">{n}</span>' if n == page_no
+        else f'<a class="s-pagination-item s-pagination-button" href="/s?k={query}&amp;page={n}&amp;ref=sr_pg_{n}">{n}</a>'
+        for n in range(max(1, page_no - 1), min(last_page, page_no + 2) + 1))
+    if last_page > page_no + 2:
+        pages += f'<span class="s-pagination-item s-pagination-ellipsis">...</span><span class="s-pagination-item s-pagination-disabled">{last_page}</span>'
+    if page_no < last_page:
+        pages += f'<a class="s-pagination-item s-pagination-next s-pagination-button" href="/s?k={query}&amp;page={page_no + 1}&amp;qid=1&amp;ref=sr_pg_{page_no}">Next</a>'
+    else:
+        pages += '<span class="s-pagination-item s-pagination-next s-pagination-disabled">Next</span>'
+    return f'''<!doctype html>
+<html lang="en-in"><head><meta charset="utf-8"><title>Amazon.in : {query}</title>
+<script>window.ue_t0 = window.ue_t0 || +new Date();</script></head>
+<body><div id="search"><div class="s-desktop-width-max s-desktop-content">
+<div class="s-main-slot s-result-list s-search-results sg-row">{cards}</div>
+<div class="a-section a-text-center s-pagination-container" role="navigation"><span class="s-pagination-strip">{pages}</span></div>
+</div></div></body></html>'''
+
+
+def write_amazon_fixtures(directory=AMAZON_DIR, pages=5, last_page=20, items=48):
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for page_no in range(1, pages + 1):
+        path = os.path.join(directory, f'search_page_{page_no}.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(amazon_search_page(page_no, last_page=last_page, items=items))
+        paths.append(path)
+    return paths
+
+
+def amazon_fixture_paths(directory=AMAZON_DIR):
+    """Saved pages in ``directory``, generating a synthetic set first if it is empty."""
+    if os.path.isdir(directory):
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.html'))
+        if paths:
+            return paths
+    return write_amazon_fixtures(directory)
+
+
+def youtube_video(index, rng):
+    unit, most = rng.choice([('hour', 23), ('day', 6), ('week', 3), ('month', 11), ('year', 9)])
+    amount = rng.randint(1, most)
+    views = rng.choice([f"{rng.randint(1, 999)} views", f"{rng.randint(1, 99)}.{rng.randint(0, 9)}K views",
+                        f"{rng.randint(1, 9)}.{rng.randint(0, 9)}M views"])
+    return {
+        'id': f"vid{index:08d}",
+        'title': f"Video {index}: {rng.choice(['Unboxing', 'Review', 'Tutorial', 'Live'])} #{rng.randint(1, 999)}",
+        'views': views,
+        'date': f"{amount} {unit}{'s' if amount > 1 else ''} ago",
+    }
+
+
+# Renders the videos in batches like YouTube's feed: a continuation spinner sits at the
+# bottom while more are left, and scrolling to it loads the next batch after a delay.
+_YOUTUBE_FEED_JS = """
+const videos = %(videos)s;
+const batch = %(batch)d, delayMs = %(delay_ms)d;
+const contents = document.getElementById('contents');
+let shown = 0, loading = false;
+function card(v) {
+    const el = document.createElement('ytd-rich-item-renderer');
+    el.innerHTML = '<div id="details"><a id="video-title-link" href="/watch?v=' + v.id + '">' +
+        '<yt-formatted-string id="video-title"></yt-formatted-string></a>' +
+        '<div id="metadata-line"><span class="inline-metadata-item style-scope ytd-video-meta-block"></span>' +
+        '<span class="inline-metadata-item style-scope ytd-video-meta-block"></span></div></div>';
+    el.querySelector('#video-title').textContent = v.title;
+    const meta = el.querySelectorAll('span.inline-metadata-item');
+    meta[0].textContent = v.views;
+    meta[1].textContent = v.date;
+    return el;
+}
+function loadMore() {
+    const spinner = document.querySelector('ytd-continuation-item-renderer');
+    if (spinner) spinner.remove();
+    for (const v of videos.slice(shown, shown + batch)) contents.appendChild(card(v));
+    shown = Math.min(shown + batch, videos.length);
+    if (shown < videos.length) contents.appendChild(document.createElement('ytd-continuation-item-renderer'));
+    loading = false;
+}
+window.addEventListener('scroll', () => {
+    if (loading || shown >= videos.length) return;
+    if (window.innerHeight + window.scrollY < document.documentElement.scrollHeight - 50) return;
+    loading = true;
+    setTimeout(loadMore, delayMs);
+});
+loadMore();
+"""
+
+
+def youtube_channel_page(videos=300, batch=30, delay_ms=150, seed=0):
+    """A channel's videos page holding ``videos`` videos, ``batch`` more per scroll."""
+    rng = random.Random(seed)
+    data = [youtube_video(i, rng) for i in range(videos)]
+    script = _YOUTUBE_FEED_JS % {'videos': json.dumps(data), 'batch': batch, 'delay_ms': delay_ms}
+    return f'''<!doctype html>
+<html><head><meta charset="utf-8"><title>Benchmark Channel - YouTube</title>
+<style>
+ytd-rich-item-renderer {{ display: block; height: 240px; }}
+ytd-continuation-item-renderer {{ display: block; height: 60px; }}
+</style></head>
+<body><ytd-app><div id="contents" class="style-scope ytd-rich-grid-renderer"></div></ytd-app>
+<script>{script}</script></body></html>'''
+
@@ -0,0 +1,85 @@
+"""Local HTTP server that stands in for amazon.in and YouTube during benchmarks.
+
+``/s?k=...&page=N`` serves Amazon search result page N and
+``/@bench/videos`` serves the YouTube channel page. Every response can be
+delayed by ``latency`` seconds to mimic a real network.
+"""
+import http.server
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+
+class StubServer:
+    """Serves fixture pages on 127.0.0.1 from a background thread; use as a context manager."""
+
+    def __init__(self, amazon_pages: Dict[int, str], youtube_page: Optional[str] = None, latency: float = 0.0):
+        self.amazon_pages = amazon_pages
+        self.youtube_page = youtube_page
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def amazon_url(self, query: str = 'laptop') -> str:
+        return f"{self.base_url}/s?k={query}"
+
+    def youtube_url(self) -> str:
+        return f"{self.base_url}/@bench/videos"
+
+    def _page_for(self, path: str) -> Optional[str]:
+        parsed = urlparse(path)
+        if parsed.path == '/s':
+            page = int(parse_qs(parsed.query).get('page', ['1'])[0])
+            return self.amazon_pages.get(page)
+        if parsed.path == '/@bench/videos':
+            return self.youtube_page
+        return None
+
+    def _handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                body = server._page_for(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'StubServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
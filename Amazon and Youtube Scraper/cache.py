@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+logger = logging.getLogger(__name__)
+
+HIT = 'hit'
+MISS = 'miss'
+COALESCED = 'coalesced'
+
+# Query parameters that only track where a search came from and never change the results
+TRACKING_PARAMS = {'crid', 'sprefix', 'ref', 'ref_', 'qid', 'sr', 'dib', 'dib_tag', 'content-id',
+                   'si', 'feature', 'pp', 'app'}
+TRACKING_PREFIXES = ('utm_', 'pd_rd_', 'pf_rd_')
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a search or channel URL, so equivalent URLs share a cache entry."""
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    params = sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if k not in TRACKING_PARAMS and not k.startswith(TRACKING_PREFIXES)
+    )
+    path = parsed.path.rstrip('/') or '/'
+    return urlunparse(((parsed.scheme or 'https').lower(), host, path, '', urlencode(params), ''))
+
+
+def cache_key(kind: str, url: str, **options) -> str:
+    parts = [kind, normalize_url(url)]
+    parts += [f'{name}={options[name]}' for name in sorted(options)]
+    return '|'.join(parts)
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    path: str
+    rows: int
+    created_at: float = field(default_factory=time.time)
+
+
+class _Flight:
+    """A scrape in progress that other requests for the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry: Optional[CacheEntry] = None
+        self.error: Optional[BaseException] = None
+
+
+class ResultCache:
+    """Finished scrape results keyed on normalized query, with TTL and LRU eviction.
+
+    ``get_or_compute`` runs at most one scrape per key at a time: callers that
+    ask for a key while it is being scraped wait for that scrape and share its
+    result. Results are kept as NDJSON copies under ``root``; the index of
+    them lives in memory, so ``remove_orphans`` should be called at start-up
+    to delete copies left by an earlier run.
+    """
+
+    def __init__(self, root: str, ttl: float = 900, max_entries: int = 200):
+        self.root = root
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = self.evictions = 0
+
+    def remove_orphans(self):
+        """Delete every file under ``root``; call before the first lookup."""
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            try:
+                os.remove(os.path.join(self.root, name))
+            except OSError:
+                pass
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.ndjson')
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self.evictions += 1
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def get_or_compute(self, key: str, compute: Callable[[], Tuple[str, int]]) -> Tuple[CacheEntry, str]:
+        """Return ``(entry, source)`` where source is HIT, MISS or COALESCED.
+
+        ``compute()`` scrapes and returns ``(ndjson_path, rows, complete)``; it only runs on a MISS.
+        Empty and incomplete results (pages that failed, a scrape cut short) are handed back
+        but not cached, since they usually mean the scrape was blocked.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry.created_at <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry, HIT
+            if entry:
+                self._drop(key)
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error:
+                raise flight.error
+            return flight.entry, COALESCED
+
+        try:
+            path, rows, complete = compute()
+            entry = CacheEntry(key, path, rows)
+            if rows and complete:
+                entry = self._store(key, path, rows)
+            flight.entry = entry
+            return entry, MISS
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def _store(self, key: str, path: str, rows: int) -> CacheEntry:
+        os.makedirs(self.root, exist_ok=True)
+        cached = self._path(key)
+        tmp = f'{cached}.tmp'
+        try:
+            os.link(path, tmp)  # The job's file is complete, so a hard link is enough
+        except OSError:
+            shutil.copyfile(path, tmp)
+        os.replace(tmp, cached)
+        entry = CacheEntry(key, cached, rows)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return entry
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'in_flight': len(self._inflight),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.coalesced) / lookups, 3) if lookups else None,
+            }
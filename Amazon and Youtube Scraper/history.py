@@ -0,0 +1,247 @@
+import logging
+import re
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import List, Optional
+import pandas as pd
+from cache import normalize_url
+from scrapers.normalize import normalize_products
+
+logger = logging.getLogger(__name__)
+
+_ASIN = re.compile(r'/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})(?:[/?]|$)')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY,
+    query TEXT NOT NULL UNIQUE
+);
+-- One row per product per scrape, clustered by product so a product's history is one range read
+CREATE TABLE IF NOT EXISTS observations (
+    asin TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    query_id INTEGER NOT NULL,
+    price_paise INTEGER,
+    rating REAL,
+    reviews INTEGER,
+    PRIMARY KEY (asin, observed_at, query_id)
+) WITHOUT ROWID;
+-- Latest state per product; prev_price is the price before the last change
+CREATE TABLE IF NOT EXISTS products (
+    asin TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    title TEXT,
+    last_price INTEGER,
+    prev_price INTEGER,
+    price_changed_at REAL,
+    rating REAL,
+    reviews INTEGER,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_drop ON products (prev_price - last_price);
+-- Per query per UTC day, kept as sums so every scrape can add to it
+CREATE TABLE IF NOT EXISTS daily (
+    query_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    products INTEGER NOT NULL,
+    priced INTEGER NOT NULL,
+    price_sum INTEGER NOT NULL,
+    price_min INTEGER,
+    price_max INTEGER,
+    rated INTEGER NOT NULL,
+    rating_sum REAL NOT NULL,
+    PRIMARY KEY (query_id, day)
+) WITHOUT ROWID;
+'''
+
+UPSERT_PRODUCT = '''
+INSERT INTO products (asin, url, title, last_price, rating, reviews, first_seen, last_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (asin) DO UPDATE SET
+    url = excluded.url,
+    title = COALESCE(excluded.title, title),
+    prev_price = CASE WHEN excluded.last_price != last_price THEN last_price ELSE prev_price END,
+    price_changed_at = CASE WHEN excluded.last_price != last_price THEN excluded.last_seen ELSE price_changed_at END,
+    last_price = COALESCE(excluded.last_price, last_price),
+    rating = COALESCE(excluded.rating, rating),
+    reviews = COALESCE(excluded.reviews, reviews),
+    last_seen = excluded.last_seen
+'''
+
+UPSERT_DAILY = '''
+INSERT INTO daily (query_id, day, products, priced, price_sum, price_min, price_max, rated, rating_sum)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (query_id, day) DO UPDATE SET
+    products = products + excluded.products,
+    priced = priced + excluded.priced,
+    price_sum = price_sum + excluded.price_sum,
+    price_min = MIN(COALESCE(price_min, excluded.price_min), COALESCE(excluded.price_min, price_min)),
+    price_max = MAX(COALESCE(price_max, excluded.price_max), COALESCE(excluded.price_max, price_max)),
+    rated = rated + excluded.rated,
+    rating_sum = rating_sum + excluded.rating_sum
+'''
+
+
+def _rupees(paise: Optional[int]) -> Optional[float]:
+    return paise / 100 if paise is not None else None
+
+
+class HistoryRecorder:
+    """Sink that appends every page of a scrape to the history store in one transaction per page."""
+
+    def __init__(self, history: 'PriceHistory', query: str):
+        self.history = history
+        self.query = query
+        self.observed_at = time.time()
+        self.rows_written = 0
+        self._query_id = None
+
+    def write(self, rows: List[dict]):
+        if not rows:
+            return
+        try:
+            self._query_id = self.history.record(self.query, rows, self.observed_at, self._query_id)
+            self.rows_written += len(rows)
+        except sqlite3.Error as e:
+            # History is a side record; it must never fail the scrape itself
+            logger.error(f"Could not record price history for {self.query}: {e}")
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class PriceHistory:
+    """Every scraped Amazon product over time, in SQLite (WAL mode).
+
+    ``observations`` holds one row per product per scrape keyed on
+    (ASIN, time); ``products`` keeps each product's latest and previous
+    price for the drops query and ``daily`` keeps per-query, per-day
+    aggregates for trends, so no API call scans the observations.
+    """
+
+    def __init__(self, path: str = 'history.db'):
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def recorder(self, query: str) -> HistoryRecorder:
+        return HistoryRecorder(self, query)
+
+    def _query_id(self, conn: sqlite3.Connection, query: str) -> int:
+        key = normalize_url(query)
+        conn.execute('INSERT OR IGNORE INTO queries (query) VALUES (?)', (key,))
+        return conn.execute('SELECT id FROM queries WHERE query = ?', (key,)).fetchone()[0]
+
+    def record(self, query: str, rows: List[dict], observed_at: Optional[float] = None,
+               query_id: Optional[int] = None) -> int:
+        """Store one page of product rows; returns the query's id."""
+        observed_at = observed_at or time.time()
+        df = normalize_products(pd.DataFrame.from_records(
+            rows, columns=['title', 'price', 'rating', 'reviews', 'url', 'asin']))
+        # The card's data-asin, else one in a /dp/ link; rows with neither are not tracked
+        df['asin'] = df['asin'].where(df['asin'].notna() & (df['asin'] != ''),
+                                      df['url'].str.extract(_ASIN, expand=False))
+        df = df[df['asin'].notna()]
+        # object dtype gives sqlite plain Python values, with None for missing ones
+        typed = df[['asin', 'url', 'title', 'price_paise', 'rating_value', 'review_count']].astype(object)
+        typed = typed.where(typed.notna(), None)
+        products = [(asin, url, title, price, rating, reviews, observed_at, observed_at)
+                    for asin, url, title, price, rating, reviews in typed.itertuples(index=False)]
+        prices = df['price_paise'].dropna()
+        ratings = df['rating_value'].dropna()
+
+        day = datetime.fromtimestamp(observed_at, timezone.utc).date().isoformat()
+        with closing(self._connect()) as conn, conn:
+            if query_id is None:
+                query_id = self._query_id(conn, query)
+            conn.executemany(
+                'INSERT OR IGNORE INTO observations (asin, observed_at, query_id, price_paise, rating, reviews) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(asin, at, query_id, price, rating, reviews) for asin, _, _, price, rating, reviews, at, _ in products])
+            conn.executemany(UPSERT_PRODUCT, products)
+            if products:
+                conn.execute(UPSERT_DAILY, (
+                    query_id, day, len(products), len(prices), int(prices.sum()),
+                    int(prices.min()) if len(prices) else None, int(prices.max()) if len(prices) else None,
+                    len(ratings), float(ratings.sum())))
+        return query_id
+
+    def price_history(self, asin: str, limit: int = 500) -> Optional[dict]:
+        """A product's latest state and its most recent observations, oldest first."""
+        with closing(self._connect()) as conn:
+            product = conn.execute('SELECT * FROM products WHERE asin = ?', (asin,)).fetchone()
+            if product is None:
+                return None
+            points = conn.execute(
+                'SELECT observed_at, price_paise, rating, reviews FROM observations '
+                'WHERE asin = ? ORDER BY observed_at DESC LIMIT ?', (asin, limit)).fetchall()
+        return {
+            'asin': asin,
+            'url': product['url'],
+            'title': product['title'],
+            'price': _rupees(product['last_price']),
+            'first_seen': product['first_seen'],
+            'last_seen': product['last_seen'],
+            'points': [{
+                'observed_at': p['observed_at'],
+                'price': _rupees(p['price_paise']),
+                'rating': p['rating'],
+                'reviews': p['reviews'],
+            } for p in reversed(points)],
+        }
+
+    def biggest_drops(self, limit: int = 20, since: Optional[float] = None) -> List[dict]:
+        """Products whose latest price change was the largest cut, optionally only changes after ``since``."""
+        sql = ('SELECT asin, url, title, prev_price, last_price, price_changed_at FROM products '
+               'WHERE prev_price - last_price > 0')
+        args = []
+        if since is not None:
+            sql += ' AND price_changed_at >= ?'
+            args.append(since)
+        sql += ' ORDER BY prev_price - last_price DESC LIMIT ?'
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, args + [limit]).fetchall()
+        return [{
+            'asin': r['asin'],
+            'url': r['url'],
+            'title': r['title'],
+            'previous_price': _rupees(r['prev_price']),
+            'price': _rupees(r['last_price']),
+            'drop': _rupees(r['prev_price'] - r['last_price']),
+            'drop_pct': round((r['prev_price'] - r['last_price']) * 100 / r['prev_price'], 1),
+            'changed_at': r['price_changed_at'],
+        } for r in rows]
+
+    def trends(self, query: str, days: int = 30) -> List[dict]:
+        """Daily product count, price and rating figures for a search query, oldest first."""
+        since = datetime.fromtimestamp(time.time() - days * 86400, timezone.utc).date().isoformat()
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT id FROM queries WHERE query = ?', (normalize_url(query),)).fetchone()
+            if row is None:
+                return []
+            rows = conn.execute(
+                'SELECT * FROM daily WHERE query_id = ? AND day >= ? ORDER BY day', (row['id'], since)).fetchall()
+        return [{
+            'day': r['day'],
+            'products': r['products'],
+            'avg_price': round(r['price_sum'] / r['priced'] / 100, 2) if r['priced'] else None,
+            'min_price': _rupees(r['price_min']),
+            'max_price': _rupees(r['price_max']),
+            'avg_rating': round(r['rating_sum'] / r['rated'], 2) if r['rated'] else None,
+        } for r in rows]
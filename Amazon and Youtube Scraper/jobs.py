@@ -0,0 +1,312 @@
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from scrapers.stats import ScrapeStats
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    owner: str
+    query: str
+    pages_total: Optional[int] = None
+    status: str = QUEUED
+    pages_done: int = 0
+    items_found: int = 0
+    message: str = ''
+    stats: ScrapeStats = field(default_factory=ScrapeStats)  # Filled in by the scrape as it runs
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    batch_id: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def update_progress(self, pages_done: int, items_found: int):
+        """Progress callback handed to the scrapers."""
+        self.pages_done = pages_done
+        self.items_found = items_found
+
+    def eta(self) -> Optional[float]:
+        """Seconds left, estimated from the average time per finished page."""
+        if self.status != RUNNING or not self.pages_total or not self.pages_done:
+            return None
+        elapsed = time.time() - self.started_at
+        remaining = max(self.pages_total - self.pages_done, 0)
+        return round(elapsed / self.pages_done * remaining, 1)
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'query': self.query,
+            'status': self.status,
+            'pages_done': self.pages_done,
+            'pages_total': self.pages_total,
+            'items_found': self.items_found,
+            'eta': self.eta(),
+            'message': self.message,
+            'stats': self.stats.to_dict(),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'batch_id': self.batch_id,
+        }
+
+
+class JobManager:
+    """Runs scrape jobs on a fixed-size worker pool so web requests return immediately.
+
+    ``max_workers`` bounds how many scrapes (and therefore browsers) run at once;
+    everything else waits in the executor queue with status ``queued``.
+    ``on_finish(job)`` is called after every job, done or failed.
+    """
+
+    def __init__(self, max_workers: int = 2, keep_finished: int = 100,
+                 on_finish: Optional[Callable[[Job], None]] = None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scrape')
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self.max_workers = max_workers
+        self.keep_finished = keep_finished
+        self.on_finish = on_finish
+
+    def submit(self, kind: str, owner: str, query: str,
+               func: Callable[[Job], str], pages_total: Optional[int] = None) -> Job:
+        """Queue ``func(job)``; its return value becomes the job's final message."""
+        job = Job(id=uuid.uuid4().hex, kind=kind, owner=owner, query=query, pages_total=pages_total)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self.run, job, func)
+        return job
+
+    def add(self, job: Job):
+        """Track a job that is run elsewhere (see BatchScheduler), so it can be looked up like the others."""
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+
+    def run(self, job: Job, func: Callable[[Job], str]):
+        """Run ``func(job)`` on the calling thread, recording its status and calling ``on_finish``."""
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.message = func(job) or ''
+            job.status = DONE
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {e}")
+            job.message = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            if self.on_finish:
+                try:
+                    self.on_finish(job)
+                except Exception as e:
+                    logger.error(f"Finish hook failed for job {job.id}: {e}")
+
+    def _prune(self):
+        finished = sorted((j for j in self._jobs.values() if j.finished), key=lambda j: j.finished_at)
+        for job in finished[:max(len(finished) - self.keep_finished, 0)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def all_jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def jobs_for(self, owner: str) -> List[Job]:
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if j.owner == owner]
+        return sorted(jobs, key=lambda j: j.created_at, reverse=True)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+@dataclass
+class Batch:
+    """Many scrape jobs submitted together, scheduled by a BatchScheduler."""
+    id: str
+    owner: str
+    items: List[Job]
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+        for item in self.items:
+            counts[item.status] += 1
+        return counts
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'status': DONE if self.finished else (RUNNING if any(i.status != QUEUED for i in self.items) else QUEUED),
+            'counts': self.counts(),
+            'items_found': sum(item.items_found for item in self.items),
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'queries': [item.to_dict() for item in self.items],
+        }
+
+
+class BatchScheduler:
+    """Runs the jobs of many batches on ``max_workers`` threads, fairly.
+
+    Queued jobs are grouped by the host they scrape. Free workers take hosts
+    in turn, and within a host take batches in turn, so one large batch does
+    not starve another and a host's queue never blocks the others. At most
+    ``per_host`` jobs (by default, every worker) scrape the same host at once;
+    the per-host rate limiter spaces out their requests. Jobs are also added to ``jobs`` (a
+    JobManager), which runs them, so they show up in its status, metrics and
+    timelines like any other job.
+    """
+
+    def __init__(self, jobs: JobManager, max_workers: int = 2, per_host: Optional[int] = None,
+                 keep_finished: int = 20):
+        self.jobs = jobs
+        self.max_workers = max_workers
+        self.per_host = per_host or max_workers
+        self.keep_finished = keep_finished
+        self._batches: Dict[str, Batch] = {}
+        # host -> batch id -> jobs waiting, in submission order
+        self._queues: Dict[str, 'OrderedDict[str, Deque[Tuple[Job, Callable]]]'] = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._left: Dict[str, int] = {}  # batch id -> jobs not finished yet
+        self._on_done: Dict[str, Callable[[Batch], None]] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._workers = []
+
+    def submit(self, owner: str, items: List[Tuple[str, str, Callable[[Job], str], Optional[int]]],
+               on_done: Optional[Callable[[Batch], None]] = None, batch_id: Optional[str] = None) -> Batch:
+        """Queue ``(kind, query, func, pages_total)`` items as one batch; ``on_done(batch)`` runs after the last."""
+        batch = Batch(id=batch_id or uuid.uuid4().hex, owner=owner, items=[])
+        tasks = []
+        for kind, query, func, pages_total in items:
+            job = Job(id=uuid.uuid4().hex, kind=kind, owner=owner, query=query,
+                      pages_total=pages_total, batch_id=batch.id)
+            batch.items.append(job)
+            tasks.append((job, func))
+        with self._cond:
+            self._start_workers()
+            self._batches[batch.id] = batch
+            self._prune()
+            self._left[batch.id] = len(tasks)
+            if on_done:
+                self._on_done[batch.id] = on_done
+            for job, func in tasks:
+                self.jobs.add(job)
+                host = urlparse(job.query).netloc.lower()
+                self._queues.setdefault(host, OrderedDict()).setdefault(batch.id, deque()).append((job, func))
+            self._cond.notify_all()
+        if not tasks:
+            self._finish(batch)
+        return batch
+
+    def _start_workers(self):
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, name=f'batch_{len(self._workers)}', daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _next(self) -> Optional[Tuple[str, str, Job, Callable]]:
+        """The next job to run, taking hosts and then batches in turn; None if every host is busy or idle."""
+        for host in list(self._queues):
+            if self._running.get(host, 0) >= self.per_host:
+                continue
+            batches = self._queues.pop(host)
+            batch_id, queue = next(iter(batches.items()))
+            job, func = queue.popleft()
+            del batches[batch_id]
+            if queue:
+                batches[batch_id] = queue  # This batch goes to the back of the host's line
+            if batches:
+                self._queues[host] = batches  # And this host to the back of the hosts
+            self._running[host] = self._running.get(host, 0) + 1
+            return host, batch_id, job, func
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                task = self._next()
+                while task is None and not self._closed:
+                    self._cond.wait()
+                    task = self._next()
+                if task is None:
+                    return
+            host, batch_id, job, func = task
+            self.jobs.run(job, func)
+            with self._cond:
+                self._running[host] -= 1
+                self._left[batch_id] -= 1
+                last = self._left[batch_id] == 0
+                self._cond.notify_all()
+            if last:
+                self._finish(self._batches[batch_id])
+
+    def _finish(self, batch: Batch):
+        with self._cond:
+            self._left.pop(batch.id, None)
+            on_done = self._on_done.pop(batch.id, None)
+        try:
+            if on_done:
+                on_done(batch)
+        except Exception as e:
+            logger.error(f"Finishing batch {batch.id} failed: {e}")
+        finally:
+            batch.finished_at = time.time()
+
+    def _prune(self):
+        finished = sorted((b for b in self._batches.values() if b.finished), key=lambda b: b.finished_at)
+        for batch in finished[:max(len(finished) - self.keep_finished, 0)]:
+            del self._batches[batch.id]
+
+    def get(self, batch_id: str) -> Optional[Batch]:
+        with self._cond:
+            return self._batches.get(batch_id)
+
+    def all_batches(self) -> List[Batch]:
+        with self._cond:
+            return list(self._batches.values())
+
+    def batches_for(self, owner: str) -> List[Batch]:
+        with self._cond:
+            batches = [b for b in self._batches.values() if b.owner == owner]
+        return sorted(batches, key=lambda b: b.created_at, reverse=True)
+
+    def queued(self) -> int:
+        with self._cond:
+            return sum(len(queue) for batches in self._queues.values() for queue in batches.values())
+
+    def shutdown(self):
+        """Stop taking queued jobs; jobs already running finish."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
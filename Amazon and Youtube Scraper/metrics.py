@@ -0,0 +1,144 @@
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Upper bounds in seconds, from a fast parse to a long channel scroll
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+    """A small in-process registry rendered in the Prometheus text exposition format.
+
+    Counters and histograms are updated as jobs finish and downloads are
+    converted; collected metrics are read from callbacks each time ``/metrics``
+    is scraped.
+    """
+
+    def __init__(self):
+        self._meta: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._buckets: Dict[str, tuple] = {}
+        self._collected: Dict[str, Callable[[], List[Tuple[dict, float]]]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str):
+        self._meta[name] = ('counter', help_text)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self._meta[name] = ('histogram', help_text)
+        self._histograms.setdefault(name, {})
+        self._buckets[name] = tuple(buckets)
+
+    def collect(self, name: str, help_text: str, collect: Callable[[], List[Tuple[dict, float]]],
+                kind: str = 'gauge'):
+        """A metric read from state kept elsewhere: ``collect()`` returns ``[(labels, value), ...]``
+        whenever the metrics are rendered. ``kind`` is 'gauge' or, for running totals, 'counter'."""
+        self._meta[name] = (kind, help_text)
+        self._collected[name] = collect
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms[name]
+            if key not in series:
+                series[key] = _Histogram(self._buckets[name])
+            series[key].observe(value)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in self._meta.items():
+                if name in self._collected:
+                    continue
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                if kind == 'counter':
+                    for labels, value in sorted(self._counters[name].items()):
+                        lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                elif kind == 'histogram':
+                    for labels, hist in sorted(self._histograms[name].items()):
+                        cumulative = 0
+                        for bound, count in zip(hist.buckets, hist.counts):
+                            cumulative += count
+                            lines.append(f'{name}_bucket{_format_labels(labels, [("le", _format_value(bound))])} '
+                                         f'{cumulative}')
+                        lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {hist.count}')
+                        lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(round(hist.sum, 6))}')
+                        lines.append(f'{name}_count{_format_labels(labels)} {hist.count}')
+        # Collectors take other locks, so they run outside ours
+        for name, collect in self._collected.items():
+            kind, help_text = self._meta[name]
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in collect():
+                if value is not None:
+                    lines.append(f'{name}{_format_labels(_labels(labels))} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def scrape_metrics() -> Metrics:
+    """The registry with the app's job, stage, event and export metrics declared."""
+    metrics = Metrics()
+    metrics.counter('scrape_jobs_total', 'Finished scrape jobs by kind and status.')
+    metrics.counter('scrape_items_total', 'Items found by finished scrape jobs.')
+    metrics.counter('scrape_events_total', 'Scrape events such as pages, CAPTCHAs, timeouts and retries.')
+    metrics.histogram('scrape_job_duration_seconds', 'Wall time of finished scrape jobs.')
+    metrics.histogram('scrape_job_queue_seconds', 'Time scrape jobs waited for a free worker.')
+    metrics.histogram('scrape_stage_seconds', 'Time one job spent in each stage, summed over its threads.')
+    metrics.histogram('export_seconds', 'Time to convert a result to a download format.')
+    return metrics
+
+
+def record_job(metrics: Metrics, job):
+    """Fold a finished job's ScrapeStats into ``metrics``."""
+    metrics.inc('scrape_jobs_total', kind=job.kind, status=job.status)
+    metrics.inc('scrape_items_total', job.items_found, kind=job.kind)
+    if job.started_at and job.finished_at:
+        metrics.observe('scrape_job_duration_seconds', job.finished_at - job.started_at, kind=job.kind)
+        metrics.observe('scrape_job_queue_seconds', job.started_at - job.created_at, kind=job.kind)
+    stats = job.stats.to_dict()
+    for stage, seconds in stats['timings'].items():
+        metrics.observe('scrape_stage_seconds', seconds, kind=job.kind, stage=stage)
+    for event, count in stats['counters'].items():
+        metrics.inc('scrape_events_total', count, kind=job.kind, event=event)
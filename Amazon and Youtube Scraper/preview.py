@@ -0,0 +1,191 @@
+"""Indexed SQLite copies of finished results, so they can be paged, sorted and
+filtered on the server instead of downloaded whole.
+
+Each copy is built from the job's NDJSON the first time it is previewed and
+holds every column of the result, with the typed columns (see
+scrapers.normalize) stored as numbers and indexed for range filters and sorts.
+"""
+import json
+import math
+import os
+import sqlite3
+import uuid
+from contextlib import closing
+from datetime import datetime
+from typing import Callable, Dict, List, Mapping, Tuple
+from scrapers.export import iter_ndjson
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+# Bounds of an SQLite INTEGER; binding anything outside them raises OverflowError
+SQLITE_MIN_INT, SQLITE_MAX_INT = -2 ** 63, 2 ** 63 - 1
+
+# Column -> SQLite type; every other column is TEXT
+COLUMN_TYPES = {
+    'price_paise': 'INTEGER',
+    'rating_value': 'REAL',
+    'review_count': 'INTEGER',
+    'sponsored': 'INTEGER',
+    'view_count': 'INTEGER',
+    'upload_ts': 'INTEGER',
+}
+BOOL_COLUMNS = {'sponsored'}
+
+INDEXED = {
+    'amazon': ['price_paise', 'rating_value', 'review_count', 'sponsored'],
+    'youtube': ['view_count', 'upload_ts'],
+}
+
+# sort parameter -> column
+SORTS = {
+    'amazon': {'price': 'price_paise', 'rating': 'rating_value', 'reviews': 'review_count', 'title': 'title'},
+    'youtube': {'views': 'view_count', 'uploaded': 'upload_ts', 'title': 'title'},
+}
+
+
+def _bool(value: str) -> int:
+    if value.lower() in ('1', 'true', 'yes', 'on'):
+        return 1
+    if value.lower() in ('0', 'false', 'no', 'off'):
+        return 0
+    raise ValueError(f"expected true or false, got {value!r}")
+
+
+def _finite(value: str) -> float:
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"expected a finite number, got {value!r}")
+    return number
+
+
+def _int(value: str) -> int:
+    number = int(value)
+    if not SQLITE_MIN_INT <= number <= SQLITE_MAX_INT:
+        raise ValueError(f"expected a number that fits in 64 bits, got {value!r}")
+    return number
+
+
+def _paise(value: str) -> int:
+    paise = _finite(value) * 100
+    if not SQLITE_MIN_INT <= paise <= SQLITE_MAX_INT:
+        raise ValueError(f"expected a price that fits in 64 bits, got {value!r}")
+    return round(paise)
+
+
+def _timestamp(value: str) -> int:
+    return int(datetime.strptime(value, '%Y-%m-%d').timestamp())
+
+
+# filter parameter -> (column, operator, converter)
+FILTERS: Dict[str, Dict[str, Tuple[str, str, Callable[[str], object]]]] = {
+    'amazon': {
+        'min_price': ('price_paise', '>=', _paise),
+        'max_price': ('price_paise', '<=', _paise),
+        'min_rating': ('rating_value', '>=', _finite),
+        'max_rating': ('rating_value', '<=', _finite),
+        'min_reviews': ('review_count', '>=', _int),
+        'sponsored': ('sponsored', '=', _bool),
+    },
+    'youtube': {
+        'min_views': ('view_count', '>=', _int),
+        'max_views': ('view_count', '<=', _int),
+        'since': ('upload_ts', '>=', _timestamp),
+        'until': ('upload_ts', '<', lambda value: _timestamp(value) + 86400),
+    },
+}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def build_index(src: str, db_path: str, scraper: str, columns: List[str], batch_size: int = 1000) -> str:
+    """Copy the NDJSON rows at ``src`` into a new SQLite file at ``db_path``; returns ``db_path``."""
+    tmp = f'{db_path}.{uuid.uuid4().hex}.tmp'
+    with closing(sqlite3.connect(tmp)) as conn:
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+        conn.execute('INSERT INTO meta VALUES (?, ?)', ('columns', json.dumps(columns)))
+        definitions = ', '.join(f"{_quote(c)} {COLUMN_TYPES.get(c, 'TEXT')}" for c in columns)
+        conn.execute(f'CREATE TABLE rows ({definitions})')
+        insert = f"INSERT INTO rows VALUES ({', '.join('?' * len(columns))})"
+        batch = []
+        for row in iter_ndjson(src):
+            batch.append([row.get(c) for c in columns])
+            if len(batch) >= batch_size:
+                conn.executemany(insert, batch)
+                batch = []
+        conn.executemany(insert, batch)
+        # Indexes go on after the bulk insert, which is much faster than keeping them up to date row by row
+        for column in INDEXED[scraper] + (['query'] if 'query' in columns else []):
+            if column in columns:
+                conn.execute(f'CREATE INDEX {_quote("idx_" + column)} ON rows ({_quote(column)})')
+        conn.commit()
+    os.replace(tmp, db_path)
+    return db_path
+
+
+def query_index(db_path: str, scraper: str, params: Mapping[str, str]) -> dict:
+    """One page of rows matching the filters in ``params``, sorted by ``sort``/``order``.
+
+    ``params`` is a request's query string: ``page``, ``per_page``, ``sort``
+    (see SORTS), ``order`` (asc or desc), ``q`` (words in the title),
+    ``query`` (one query of a batch) and the scraper's FILTERS. Raises
+    ValueError for unknown sorts and malformed values.
+    """
+    with closing(sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)) as conn:
+        conn.row_factory = sqlite3.Row
+        columns = json.loads(conn.execute("SELECT value FROM meta WHERE key = 'columns'").fetchone()[0])
+
+        where, args = [], []
+        for name, (column, op, convert) in FILTERS[scraper].items():
+            value = params.get(name)
+            if value not in (None, ''):
+                where.append(f'{_quote(column)} {op} ?')
+                args.append(convert(value))
+        if params.get('q'):
+            for word in params['q'].split():
+                where.append("title LIKE ? ESCAPE '\\'")
+                args.append('%' + word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if params.get('query') and 'query' in columns:
+            where.append('query = ?')
+            args.append(params['query'])
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ''
+
+        sort = params.get('sort') or None
+        order = (params.get('order') or 'asc').lower()
+        if sort is not None and sort not in SORTS[scraper]:
+            raise ValueError(f"Unknown sort {sort!r}, expected one of {tuple(SORTS[scraper])}")
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"Unknown order {order!r}, expected asc or desc")
+        # Scrape order by default; rowid breaks ties so pages never overlap
+        order_sql = 'ORDER BY rowid'
+        if sort:
+            order_sql = f'ORDER BY {_quote(SORTS[scraper][sort])} {order.upper()} NULLS LAST, rowid'
+
+        per_page = min(max(_int(params.get('per_page') or DEFAULT_PER_PAGE), 1), MAX_PER_PAGE)
+        page = max(_int(params.get('page') or 1), 1)
+        if (page - 1) * per_page > SQLITE_MAX_INT:
+            raise ValueError(f"Page {page} is out of range")
+        total = conn.execute(f'SELECT COUNT(*) FROM rows {where_sql}', args).fetchone()[0]
+        cursor = conn.execute(f'SELECT * FROM rows {where_sql} {order_sql} LIMIT ? OFFSET ?',
+                              args + [per_page, (page - 1) * per_page])
+        rows = []
+        for row in cursor:
+            row = dict(row)
+            for column in BOOL_COLUMNS & row.keys():
+                if row[column] is not None:
+                    row[column] = bool(row[column])
+            rows.append(row)
+
+    return {
+        'columns': columns,
+        'rows': rows,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page,
+        'sort': sort,
+        'order': order,
+    }
@@ -0,0 +1,334 @@
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Callable, Iterable, List, Optional
+from werkzeug.utils import secure_filename
+from scrapers.export import ExportSink, convert_ndjson, iter_ndjson
+from scrapers.normalize import TYPED_FIELDS, normalize_rows
+from preview import build_index, query_index
+from scrapers.youtube_scraper import VIDEO_FIELDS
+from scrapers.amazon_scraper import PRODUCT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# scraper -> (file name, columns)
+SCRAPERS = {
+    'youtube': ('youtube_videos', VIDEO_FIELDS + TYPED_FIELDS['youtube']),
+    'amazon': ('amazon_products', PRODUCT_FIELDS + TYPED_FIELDS['amazon']),
+}
+
+# Download format -> file extension
+EXPORT_FORMATS = {
+    'csv': 'csv',
+    'excel': 'xlsx',
+    'json': 'json',
+    'ndjson': 'ndjson',
+}
+
+
+class ResultSink(ExportSink):
+    """NDJSON sink that records the result's manifest once it is closed.
+
+    Each batch gets its typed columns (see scrapers.normalize) on the way in,
+    unless ``normalize`` is off because the rows already have them.
+    ``fieldnames`` replaces the scraper's usual columns (see SCRAPERS) and is
+    recorded in the manifest, so downloads convert with the same columns.
+    """
+
+    def __init__(self, store: 'ResultStore', owner: str, scraper: str, job_id: str, query: str = '',
+                 normalize: bool = True, fieldnames: Optional[List[str]] = None):
+        self.store = store
+        self.owner = owner
+        self.scraper = scraper
+        self.job_id = job_id
+        self.query = query
+        self.normalize = normalize
+        super().__init__(store.base_path(owner, scraper, job_id), fieldnames or SCRAPERS[scraper][1],
+                         formats=('ndjson',))
+
+    def write(self, rows: List[dict]):
+        super().write(normalize_rows(self.scraper, rows) if self.normalize else rows)
+
+    def close(self):
+        if self._closed:
+            return
+        super().close()
+        self.store.complete(self)
+
+
+class ResultStore:
+    """Keeps every job's results once, as NDJSON, under ``root/<user>/<job id>/``.
+
+    Jobs never share files, so any number of users can scrape and download at
+    the same time. Once a scrape finishes, a small ``<name>.manifest.json``
+    records the row count, size, mtime and version, and a ``<scraper>.latest``
+    pointer in the user's directory names their newest finished job; the
+    dashboard and download routes read only those. Other formats are
+    converted only when someone downloads them and cached in the job's
+    ``exports`` directory, keyed on the version, as are the indexed SQLite
+    copies that ``preview`` pages through and the gzipped copies of text
+    formats that ``compressed`` serves.
+
+    Each user keeps at most ``max_jobs`` jobs and ``max_bytes`` of results
+    (oldest go first), and ``sweep`` deletes jobs older than ``ttl`` seconds,
+    except those still queued or running.
+    """
+
+    def __init__(self, root: str = 'output', ttl: float = 24 * 3600,
+                 max_jobs: int = 10, max_bytes: int = 500 * 1024 * 1024):
+        self.root = root
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def user_dir(self, owner: str) -> str:
+        # Readable and filesystem safe, with a hash so distinct names never collide
+        digest = hashlib.sha1(owner.encode('utf-8')).hexdigest()[:10]
+        return os.path.join(self.root, f"{secure_filename(owner) or 'user'}-{digest}")
+
+    def job_dir(self, owner: str, job_id: str) -> str:
+        return os.path.join(self.user_dir(owner), secure_filename(job_id))
+
+    def base_path(self, owner: str, scraper: str, job_id: str) -> str:
+        return os.path.join(self.job_dir(owner, job_id), SCRAPERS[scraper][0])
+
+    def canonical_path(self, owner: str, scraper: str, job_id: str) -> str:
+        return self.base_path(owner, scraper, job_id) + '.ndjson'
+
+    def manifest_path(self, owner: str, scraper: str, job_id: str) -> str:
+        return self.base_path(owner, scraper, job_id) + '.manifest.json'
+
+    def _latest_path(self, owner: str, scraper: str) -> str:
+        return os.path.join(self.user_dir(owner), f'{scraper}.latest')
+
+    def _write_atomic(self, path: str, text: str):
+        tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def open_sink(self, owner: str, scraper: str, job_id: str, query: str = '',
+                  normalize: bool = True, fieldnames: Optional[List[str]] = None) -> ResultSink:
+        """Start the results of a new job."""
+        return ResultSink(self, owner, scraper, job_id, query, normalize, fieldnames)
+
+    def import_ndjson(self, owner: str, scraper: str, job_id: str, src: str,
+                      query: str = '', batch_size: int = 1000) -> int:
+        """Give a job a copy of results scraped elsewhere (e.g. from the cache); returns the row count."""
+        with self.open_sink(owner, scraper, job_id, query, normalize=False) as sink:
+            batch = []
+            for row in iter_ndjson(src):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    sink.write(batch)
+                    batch = []
+            sink.write(batch)
+        return sink.rows_written
+
+    def complete(self, sink: ResultSink):
+        """Write the manifest of a finished job and make it the user's latest result."""
+        st = os.stat(sink.path('ndjson'))
+        manifest = {
+            'owner': sink.owner,
+            'scraper': sink.scraper,
+            'job_id': sink.job_id,
+            'query': sink.query,
+            'version': uuid.uuid4().hex,
+            'rows': sink.rows_written,
+            'columns': sink.fieldnames,
+            'size': st.st_size,
+            'mtime': st.st_mtime,
+            'completed_at': time.time(),
+            'formats': {fmt: sink.rows_written > 0 for fmt in EXPORT_FORMATS},
+        }
+        self._write_atomic(self.manifest_path(sink.owner, sink.scraper, sink.job_id), json.dumps(manifest))
+        self._write_atomic(self._latest_path(sink.owner, sink.scraper), sink.job_id)
+        self._enforce_quota(sink.owner, keep=sink.job_id)
+
+    def latest(self, owner: str, scraper: str) -> Optional[str]:
+        try:
+            with open(self._latest_path(owner, scraper), encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def manifest(self, owner: str, scraper: str, job_id: Optional[str] = None) -> Optional[dict]:
+        """A finished job's manifest (the user's latest by default), or None."""
+        job_id = job_id or self.latest(owner, scraper)
+        if not job_id:
+            return None
+        try:
+            with open(self.manifest_path(owner, scraper, job_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def formats(self, owner: str, scraper: str) -> dict:
+        manifest = self.manifest(owner, scraper)
+        return dict(manifest['formats']) if manifest else dict.fromkeys(EXPORT_FORMATS, False)
+
+    def has_data(self, owner: str, scraper: str, job_id: Optional[str] = None) -> bool:
+        manifest = self.manifest(owner, scraper, job_id)
+        return bool(manifest and manifest['rows'])
+
+    def export(self, owner: str, scraper: str, fmt: str, job_id: Optional[str] = None) -> Optional[str]:
+        """Path of a job's results in download format ``fmt``, converting on first request."""
+        manifest = self.manifest(owner, scraper, job_id)
+        if not manifest or not manifest['formats'].get(fmt):
+            return None
+        job_id = manifest['job_id']
+        ext = EXPORT_FORMATS[fmt]
+        if ext == 'ndjson':
+            return self.canonical_path(owner, scraper, job_id)
+
+        name, fieldnames = SCRAPERS[scraper]
+        fieldnames = manifest.get('columns') or fieldnames
+        export_dir = os.path.join(self.job_dir(owner, job_id), 'exports')
+        cached = os.path.join(export_dir, f"{name}-{manifest['version']}.{ext}")
+        if os.path.exists(cached):
+            return cached
+
+        os.makedirs(export_dir, exist_ok=True)
+        # Convert under a unique name and rename, so a concurrent download never sees half a file
+        tmp_base = os.path.join(export_dir, f'.{name}-{uuid.uuid4().hex}')
+        tmp = convert_ndjson(self.canonical_path(owner, scraper, job_id), tmp_base, ext, fieldnames)
+        os.replace(tmp, cached)
+        for path in glob.glob(os.path.join(export_dir, f'{name}-*')):
+            if path != cached and f"-{manifest['version']}." not in path:
+                os.remove(path)
+        return cached
+
+    def preview(self, owner: str, scraper: str, params, job_id: Optional[str] = None) -> Optional[dict]:
+        """One page of a job's results (see preview.query_index), indexing them on first request."""
+        manifest = self.manifest(owner, scraper, job_id)
+        if not manifest:
+            return None
+        job_id = manifest['job_id']
+        name, fieldnames = SCRAPERS[scraper]
+        export_dir = os.path.join(self.job_dir(owner, job_id), 'exports')
+        db_path = os.path.join(export_dir, f"{name}-{manifest['version']}.sqlite")
+        if not os.path.exists(db_path):
+            os.makedirs(export_dir, exist_ok=True)
+            build_index(self.canonical_path(owner, scraper, job_id), db_path, scraper,
+                        manifest.get('columns') or fieldnames)
+        page = query_index(db_path, scraper, params)
+        page.update(job_id=job_id, query=manifest['query'], completed_at=manifest['completed_at'])
+        return page
+
+    def compressed(self, path: str) -> str:
+        """A gzipped copy of an exported file, written next to it on first request."""
+        gz_path = path + '.gz'
+        if not os.path.exists(gz_path) or os.path.getmtime(gz_path) < os.path.getmtime(path):
+            tmp = f'{gz_path}.{uuid.uuid4().hex}.tmp'
+            with open(path, 'rb') as src, gzip.open(tmp, 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(tmp, gz_path)
+        return gz_path
+
+    def _jobs(self, user_dir: str) -> List[dict]:
+        """Finished jobs in a user directory, oldest first."""
+        jobs = []
+        for manifest_path in glob.glob(os.path.join(user_dir, '*', '*.manifest.json')):
+            try:
+                with open(manifest_path, encoding='utf-8') as f:
+                    jobs.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(jobs, key=lambda m: m['completed_at'])
+
+    def _remove_job(self, owner: str, job_id: str):
+        shutil.rmtree(self.job_dir(owner, job_id), ignore_errors=True)
+        for scraper in SCRAPERS:
+            if self.latest(owner, scraper) == job_id:
+                os.remove(self._latest_path(owner, scraper))
+
+    def _enforce_quota(self, owner: str, keep: Optional[str] = None):
+        with self._lock:
+            jobs = self._jobs(self.user_dir(owner))
+            total = sum(m['size'] for m in jobs)
+            for manifest in list(jobs):
+                if len(jobs) <= self.max_jobs and total <= self.max_bytes:
+                    break
+                if manifest['job_id'] == keep:
+                    continue
+                logger.info(f"Quota: removing job {manifest['job_id']} of {owner}")
+                self._remove_job(owner, manifest['job_id'])
+                jobs.remove(manifest)
+                total -= manifest['size']
+
+    def clear(self, owner: str, scraper: str):
+        """Delete every finished job of ``scraper`` belonging to ``owner``."""
+        with self._lock:
+            for manifest in self._jobs(self.user_dir(owner)):
+                if manifest['scraper'] == scraper:
+                    self._remove_job(owner, manifest['job_id'])
+
+    def sweep(self, now: Optional[float] = None, active: Iterable[str] = ()) -> int:
+        """Delete jobs older than the TTL, other than the job IDs in ``active``; returns how many were removed."""
+        now = now or time.time()
+        active = {secure_filename(job_id) for job_id in active}
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        with self._lock:
+            for user_name in os.listdir(self.root):
+                user_dir = os.path.join(self.root, user_name)
+                # Dot directories (such as the query cache) are not user namespaces
+                if user_name.startswith('.') or not os.path.isdir(user_dir):
+                    continue
+                for job_name in os.listdir(user_dir):
+                    job_dir = os.path.join(user_dir, job_name)
+                    if not os.path.isdir(job_dir) or job_name in active:
+                        continue
+                    manifests = glob.glob(os.path.join(job_dir, '*.manifest.json'))
+                    # Jobs without a manifest crashed, or were cut off by a restart; judge those by
+                    # their last write, which appending rows updates on the files but not the directory
+                    paths = manifests[:1] or [job_dir] + glob.glob(os.path.join(job_dir, '*'))
+                    finished = max(os.path.getmtime(path) for path in paths)
+                    if now - finished > self.ttl:
+                        shutil.rmtree(job_dir, ignore_errors=True)
+                        removed += 1
+                for pointer in glob.glob(os.path.join(user_dir, '*.latest')):
+                    with open(pointer, encoding='utf-8') as f:
+                        job_id = f.read().strip()
+                    if not os.path.isdir(os.path.join(user_dir, job_id)):
+                        os.remove(pointer)
+                if not os.listdir(user_dir):
+                    os.rmdir(user_dir)
+        if removed:
+            logger.info(f"Removed {removed} expired result directories")
+        return removed
+
+    def start_sweeper(self, interval: float = 600, active: Optional[Callable[[], Iterable[str]]] = None,
+                      on_sweep: Optional[Callable[[float], object]] = None):
+        """Run ``sweep`` every ``interval`` seconds on a daemon thread.
+
+        ``active()`` returns the IDs of jobs that are queued or running, whose
+        results the sweep must leave alone however old they are. ``on_sweep(now)``
+        runs after each sweep, for other stores that expire on the same schedule.
+        """
+        if self._sweeper is not None:
+            return
+
+        def run():
+            while True:
+                now = time.time()
+                try:
+                    self.sweep(now, active=active() if active else ())
+                    if on_sweep:
+                        on_sweep(now)
+                except Exception as e:
+                    logger.error(f"Result sweep failed: {e}")
+                time.sleep(interval)
+
+        self._sweeper = threading.Thread(target=run, name='result-sweeper', daemon=True)
+        self._sweeper.start()
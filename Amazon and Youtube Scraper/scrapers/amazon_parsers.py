@@ -0,0 +1,230 @@
+from bs4 import BeautifulSoup
+from dataclasses import dataclass, field
+from typing import List, Optional
+from urllib.parse import parse_qs, urljoin, urlparse
+import logging
+import os
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # Only the BeautifulSoup engine is available without lxml
+    etree = lxml_html = None
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Product:
+    title: str
+    price: str
+    rating: Optional[str]
+    reviews: Optional[str]
+    delivery: Optional[str]
+    url: str
+    sponsored: bool = False
+    deal: Optional[str] = None
+    asin: Optional[str] = None
+
+@dataclass
+class SearchPage:
+    products: List[Product] = field(default_factory=list)
+    next_url: Optional[str] = None
+    last_page: Optional[int] = None
+
+
+def product_url(raw_url: str, base_url: str) -> str:
+    """The product page a result card links to, without tracking parameters.
+
+    Sponsored cards link to ``/sspa/click?...&url=<product path>``, so the
+    real path is taken from the ``url`` parameter.
+    """
+    parsed = urlparse(raw_url)
+    if parsed.path.startswith('/sspa/'):
+        target = parse_qs(parsed.query).get('url')
+        if target:
+            raw_url = target[0]
+    return urljoin(base_url, raw_url.split('?')[0])
+
+
+class SoupParser:
+    """The original BeautifulSoup engine: one CSS query per field per result card."""
+
+    name = 'soup'
+
+    def parse(self, html: str, base_url: str) -> SearchPage:
+        soup = BeautifulSoup(html, 'html.parser')
+        items = soup.select('div.s-result-item[data-component-type="s-search-result"]')
+
+        page = SearchPage()
+        for item in items:
+            product = self._extract_product_data(item, base_url)
+            if product:
+                page.products.append(product)
+
+        next_button = soup.select_one('a.s-pagination-next')
+        if next_button and not 'a-disabled' in next_button.get('class', []):
+            page.next_url = urljoin(base_url, next_button['href'])
+
+        numbers = [el.get_text(strip=True) for el in soup.select('.s-pagination-item')]
+        numbers = [int(n) for n in numbers if n.isdigit()]
+        page.last_page = max(numbers) if numbers else None
+        return page
+
+    def _extract_product_data(self, item, base_url: str) -> Optional[Product]:
+        try:
+            link = item.select_one('h2 a.a-link-normal, a.a-link-normal.s-line-clamp-2, a.a-link-normal.s-line-clamp-3')
+            if not link:
+                return None
+
+            title = link.get_text(strip=True)
+
+            price_whole = item.select_one('span.a-price-whole')
+            price = price_whole.get_text(strip=True).replace(',', '') if price_whole else None
+
+            rating = item.select_one('span.a-icon-alt')
+            rating = rating.get_text(strip=True).split()[0] if rating else None
+
+            reviews = item.select_one('span.a-size-base[aria-label], span.a-size-base.s-underline-text')
+            reviews = reviews.get_text(strip=True) if reviews else None
+
+            delivery = item.select_one('span.a-color-base.a-text-bold')
+            delivery = delivery.get_text(strip=True) if delivery else None
+
+            deal = item.select_one('span.a-badge-text')
+            deal = deal.get_text(strip=True) if deal else None
+
+            sponsored = bool(item.select_one('span.a-color-secondary:contains("Sponsored"), span:contains("Sponsored Ad")'))
+
+            return Product(
+                title=title,
+                price=price,
+                rating=rating,
+                reviews=reviews,
+                delivery=delivery,
+                url=product_url(link.get('href', ''), base_url),
+                sponsored=sponsored,
+                deal=deal,
+                asin=item.get('data-asin') or None
+            )
+        except Exception as e:
+            logger.error(f"Error extracting product data: {e}")
+            return None
+
+
+class LxmlParser:
+    """lxml engine producing the same ``Product`` fields as ``SoupParser``.
+
+    The XPath expressions are compiled once per parser, and each result card
+    is walked a single time, filling every field from the first element (in
+    document order) that matches it, which mirrors ``select_one``.
+    """
+
+    name = 'lxml'
+
+    def __init__(self):
+        if etree is None:
+            raise ImportError("The lxml parser engine requires the lxml package")
+        self._cards = etree.XPath(
+            "//div[contains(concat(' ', normalize-space(@class), ' '), ' s-result-item ')]"
+            "[@data-component-type='s-search-result']")
+        self._pagination_items = etree.XPath(
+            "//*[contains(concat(' ', normalize-space(@class), ' '), ' s-pagination-item ')]")
+        self._next_button = etree.XPath(
+            "//a[contains(concat(' ', normalize-space(@class), ' '), ' s-pagination-next ')]")
+        self._texts = etree.XPath(".//text()")
+        self._spans = etree.XPath(".//span")
+
+    def _text(self, el) -> str:
+        # Same result as BeautifulSoup's get_text(strip=True)
+        return ''.join(t.strip() for t in self._texts(el))
+
+    def parse(self, html: str, base_url: str) -> SearchPage:
+        tree = lxml_html.fromstring(html)
+
+        page = SearchPage()
+        for card in self._cards(tree):
+            product = self._extract_product_data(card, base_url)
+            if product:
+                page.products.append(product)
+
+        next_buttons = self._next_button(tree)
+        if next_buttons and 'a-disabled' not in next_buttons[0].get('class', '').split():
+            page.next_url = urljoin(base_url, next_buttons[0].get('href'))
+
+        numbers = [self._text(el) for el in self._pagination_items(tree)]
+        numbers = [int(n) for n in numbers if n.isdigit()]
+        page.last_page = max(numbers) if numbers else None
+        return page
+
+    def _extract_product_data(self, card, base_url: str) -> Optional[Product]:
+        try:
+            link = price = rating = reviews = delivery = deal = None
+            mentions_sponsored = False
+
+            for el in card.iter(etree.Element):
+                if not mentions_sponsored and ('Sponsored' in (el.text or '') or 'Sponsored' in (el.tail or '')):
+                    mentions_sponsored = True
+                tag = el.tag
+                if tag != 'span' and tag != 'a':
+                    continue
+                classes = el.get('class', '').split()
+                if not classes:
+                    continue
+                if tag == 'a':
+                    if link is None and 'a-link-normal' in classes and (
+                            's-line-clamp-2' in classes or 's-line-clamp-3' in classes
+                            or any(a.tag == 'h2' for a in el.iterancestors())):
+                        link = el
+                    continue
+                if price is None and 'a-price-whole' in classes:
+                    price = el
+                if rating is None and 'a-icon-alt' in classes:
+                    rating = el
+                if reviews is None and 'a-size-base' in classes and (
+                        el.get('aria-label') is not None or 's-underline-text' in classes):
+                    reviews = el
+                if delivery is None and 'a-color-base' in classes and 'a-text-bold' in classes:
+                    delivery = el
+                if deal is None and 'a-badge-text' in classes:
+                    deal = el
+
+            if link is None:
+                return None
+
+            sponsored = False
+            if mentions_sponsored:
+                # Rare, so the text of each span is only built for cards that mention it
+                for span in self._spans(card):
+                    text = self._text(span)
+                    if 'Sponsored Ad' in text or (
+                            'Sponsored' in text and 'a-color-secondary' in span.get('class', '').split()):
+                        sponsored = True
+                        break
+
+            return Product(
+                title=self._text(link),
+                price=self._text(price).replace(',', '') if price is not None else None,
+                rating=self._text(rating).split()[0] if rating is not None else None,
+                reviews=self._text(reviews) if reviews is not None else None,
+                delivery=self._text(delivery) if delivery is not None else None,
+                url=product_url(link.get('href', ''), base_url),
+                sponsored=sponsored,
+                deal=self._text(deal) if deal is not None else None,
+                asin=card.get('data-asin') or None
+            )
+        except Exception as e:
+            logger.error(f"Error extracting product data: {e}")
+            return None
+
+
+PARSERS = {
+    SoupParser.name: SoupParser,
+    LxmlParser.name: LxmlParser,
+}
+
+
+def get_parser(name: Optional[str] = None):
+    """Build the named engine; defaults to AMAZON_PARSER, then lxml when installed."""
+    name = name or os.environ.get('AMAZON_PARSER') or ('lxml' if etree is not None else 'soup')
+    if name not in PARSERS:
+        raise ValueError(f"Unknown parser engine {name!r}, expected one of {sorted(PARSERS)}")
+    return PARSERS[name]()
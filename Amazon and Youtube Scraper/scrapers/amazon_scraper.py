@@ -1,19 +1,19 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
-import time
-import random
-from urllib.parse import urljoin, urlparse
+from selenium.common.exceptions import TimeoutException
+from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
-from dataclasses import dataclass
-from typing import List, Optional, Tuple
-import csv
+from dataclasses import asdict, fields
+from typing import Callable, Dict, List, Optional
 import os
-import pandas as pd
-import json
+import time
+from scrapers.driver_pool import DriverPool, get_default_pool, log_page_load
+from scrapers.rate_limit import Blocked, HostRateLimiter, get_host_limiter
+from scrapers.http_fetcher import CAPTCHA_MARKERS, HttpFetcher, get_http_fetcher, is_no_results
+from scrapers.amazon_parsers import Product, SearchPage, get_parser
+from scrapers.stats import ScrapeStats
 
 # Configure logging
 logging.basicConfig(
@@ -23,171 +23,269 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@dataclass
-class Product:
-    title: str
-    price: str
-    rating: Optional[str]
-    reviews: Optional[str]
-    delivery: Optional[str]
-    url: str
-    sponsored: bool = False
-    deal: Optional[str] = None
+FETCH_MODES = ('auto', 'http', 'browser')
+PRODUCT_FIELDS = [f.name for f in fields(Product)]
+
+class PageMerger:
+    """Releases pages in page order, keeping the first occurrence of each product (by ASIN, else URL).
+
+    Pages can arrive in any order; each one is written to the sink as soon as
+    all pages before it have arrived. Without a sink the products are kept in
+    ``products``; with one, only their keys are kept, so memory does not grow
+    with the size of the result.
+    """
+
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.products: List[Product] = []
+        self.items_found = 0
+        self._pending: Dict[int, List[Product]] = {}
+        self._next_page = 1
+        self._seen = set()
+
+    def add(self, page_no: int, products: List[Product]):
+        self._pending[page_no] = products
+        self.items_found += len(products)
+        while self._next_page in self._pending:
+            self._release(self._pending.pop(self._next_page))
+            self._next_page += 1
+
+    def _release(self, products: List[Product]):
+        fresh = []
+        for product in products:
+            key = product.asin or product.url
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            fresh.append(product)
+        if self.sink is None:
+            self.products.extend(fresh)
+        elif fresh:
+            self.sink.write([asdict(p) for p in fresh])
+
+    def finish(self) -> List[Product]:
+        """Release whatever is still waiting on a missing earlier page."""
+        for page_no in sorted(self._pending):
+            self._release(self._pending.pop(page_no))
+        return self.products
 
 class AmazonScraper:
-    def __init__(self, visible_browser=False):
+    """Scrapes Amazon search results.
+
+    ``fetch_mode`` picks how pages are loaded: ``'http'`` uses plain HTTP only,
+    ``'browser'`` always uses Chrome, and ``'auto'`` (the default) tries HTTP
+    first and only falls back to Chrome when the HTML is unusable.
+
+    A page answered with a CAPTCHA, a throttling status or an empty result
+    grid (other than Amazon's "No results" page) is retried up to ``max_retries`` times: the host's rate limiter backs
+    off, and the retry starts from a fresh HTTP session or browser.
+    """
+
+    def __init__(self, visible_browser=False, pool: Optional[DriverPool] = None,
+                 concurrency: Optional[int] = None, rate_limiter: Optional[HostRateLimiter] = None,
+                 fetch_mode: Optional[str] = None, http_fetcher: Optional[HttpFetcher] = None,
+                 parser: Optional[str] = None, max_retries: Optional[int] = None):
         self.base_url = "https://www.amazon.in"
         self.visible_browser = visible_browser
-        self.driver = self._init_driver()
-        self.delay_range = (1, 3)
-
-    def _init_driver(self):
-        options = Options()
-        if not self.visible_browser:
-            options.add_argument("--headless")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--window-size=1920,1080")
-        options.add_argument("--log-level=3")  # Suppress WebGL warnings
-        options.add_argument("--silent")
-        options.add_experimental_option('excludeSwitches', ['enable-logging'])
-        options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-        driver = webdriver.Chrome(options=options)
-        return driver
-
-    def _random_delay(self):
-        delay = random.uniform(*self.delay_range)
-        time.sleep(delay)
+        # A visible browser gets a private single-driver pool; otherwise
+        # browsers are leased from the shared headless pool
+        self._owns_pool = pool is None and visible_browser
+        if pool is None:
+            pool = DriverPool(max_size=1, headless=False) if visible_browser else get_default_pool()
+        self.pool = pool
+        # Number of result pages fetched at once after the first one
+        self.concurrency = concurrency or int(os.environ.get('AMAZON_CONCURRENCY', pool.max_size))
+        self.rate_limiter = rate_limiter or get_host_limiter()
+        # Watching the browser only makes sense if pages actually load in it
+        self.fetch_mode = fetch_mode or ('browser' if visible_browser else os.environ.get('AMAZON_FETCH_MODE', 'auto'))
+        if self.fetch_mode not in FETCH_MODES:
+            raise ValueError(f"Unknown fetch mode {self.fetch_mode!r}, expected one of {FETCH_MODES}")
+        self.http = http_fetcher or get_http_fetcher()
+        # Parser engine ('lxml' or 'soup'), built once so its selectors are reused for every page
+        self.parser = get_parser(parser)
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get('AMAZON_MAX_RETRIES', 3))
+        self.stats = ScrapeStats()
+        self.archive = None
 
     def _validate_amazon_url(self, url: str) -> bool:
         parsed = urlparse(url)
         return parsed.netloc.endswith('amazon.in') or parsed.netloc.endswith('amazon.com')
 
     def _get_page(self, url: str) -> Optional[str]:
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.stats.count('retries')
+            try:
+                html = self._fetch_page(url)
+            except Blocked as e:
+                cooldown = self.rate_limiter.blocked(url)
+                self.http.rotate_session()
+                logger.warning(f"{e} on {url} (attempt {attempt + 1}); host backed off for {cooldown:.1f}s")
+                continue
+            if html:
+                self.rate_limiter.success(url)
+            return html
+        logger.error(f"Giving up on {url} after {self.max_retries + 1} blocked attempts")
+        return None
+
+    def _fetch_page(self, url: str) -> Optional[str]:
+        if self.fetch_mode != 'browser':
+            self.stats.add_time('sleep', self.rate_limiter.wait(url))
+            with self.stats.time('http'):
+                html = self.http.fetch(url, self.stats)
+            if html or self.fetch_mode == 'http':
+                return html
+            logger.info(f"Falling back to the browser for {url}")
+            self.stats.count('browser_fallbacks')
+        return self._get_page_browser(url)
+
+    def _get_page_browser(self, url: str) -> Optional[str]:
         try:
-            self._random_delay()
-            self.driver.get(url)
-            
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div.s-result-item")))
-            
-            if "api-services-support@amazon.com" in self.driver.page_source:
-                raise Exception("CAPTCHA detected - Amazon is blocking requests")
-                
-            return self.driver.page_source
+            self.stats.add_time('sleep', self.rate_limiter.wait(url))
+            with self.pool.lease(stats=self.stats) as driver:
+                started = time.perf_counter()
+                with self.stats.time('page_load'):
+                    driver.get(url)
+                try:
+                    with self.stats.time('wait'):
+                        WebDriverWait(driver, 10).until(
+                            EC.presence_of_element_located((By.CSS_SELECTOR, "div.s-result-item")))
+                except TimeoutException:
+                    page_source = driver.page_source
+                    if is_no_results(page_source):
+                        # An empty grid because nothing matched; the parser finds no products on it
+                        logger.info(f"No results for {url}")
+                        return page_source
+                    self.stats.count('timeouts')
+                    if any(marker in page_source for marker in CAPTCHA_MARKERS):
+                        self.stats.count('captchas')
+                        raise Blocked("CAPTCHA")
+                    raise Blocked("Empty result grid")
+                log_page_load(driver, url, time.perf_counter() - started, self.stats)
+
+                page_source = driver.page_source
+                if any(marker in page_source for marker in CAPTCHA_MARKERS):
+                    self.stats.count('captchas')
+                    raise Blocked("CAPTCHA")
+
+                return page_source
+        except Blocked:
+            raise
         except Exception as e:
             logger.error(f"Error loading page {url}: {e}")
             return None
 
-    def _extract_product_data(self, item) -> Optional[Product]:
-        try:
-            link = item.select_one('h2 a.a-link-normal, a.a-link-normal.s-line-clamp-2, a.a-link-normal.s-line-clamp-3')
-            if not link:
-                return None
-                
-            raw_url = link.get('href', '')
-            product_url = urljoin(self.base_url, raw_url.split('?')[0])
-            title = link.get_text(strip=True)
-
-            price_whole = item.select_one('span.a-price-whole')
-            price = price_whole.get_text(strip=True).replace(',', '') if price_whole else None
-
-            rating = item.select_one('span.a-icon-alt')
-            rating = rating.get_text(strip=True).split()[0] if rating else None
-
-            reviews = item.select_one('span.a-size-base[aria-label], span.a-size-base.s-underline-text')
-            reviews = reviews.get_text(strip=True) if reviews else None
-
-            delivery = item.select_one('span.a-color-base.a-text-bold')
-            delivery = delivery.get_text(strip=True) if delivery else None
-
-            deal = item.select_one('span.a-badge-text')
-            deal = deal.get_text(strip=True) if deal else None
-
-            sponsored = bool(item.select_one('span.a-color-secondary:contains("Sponsored"), span:contains("Sponsored Ad")'))
-
-            return Product(
-                title=title,
-                price=price,
-                rating=rating,
-                reviews=reviews,
-                delivery=delivery,
-                url=product_url,
-                sponsored=sponsored,
-                deal=deal
-            )
-        except Exception as e:
-            logger.error(f"Error extracting product data: {e}")
+    def _build_page_urls(self, next_url: str, last_page: int, max_pages: int) -> List[str]:
+        """Build the URLs of pages 2..N from the "next" link's ``page`` parameter."""
+        parsed = urlparse(next_url)
+        params = parse_qs(parsed.query, keep_blank_values=True)
+        if 'page' not in params:
+            return []
+        urls = []
+        for page in range(2, min(max_pages, last_page) + 1):
+            params['page'] = [str(page)]
+            urls.append(urlunparse(parsed._replace(query=urlencode(params, doseq=True))))
+        return urls
+
+    def _scrape_page(self, url: str, page_no: int) -> Optional[SearchPage]:
+        logger.info(f"Scraping page {page_no}")
+        html = self._get_page(url)
+        if not html:
+            self.stats.count('failed_pages')
             return None
+        if self.archive:
+            with self.stats.time('archive'):
+                self.archive.add(html, url, page_no)
 
-    def _get_next_page_url(self, soup) -> Optional[str]:
-        next_button = soup.select_one('a.s-pagination-next')
-        if next_button and not 'a-disabled' in next_button.get('class', []):
-            return urljoin(self.base_url, next_button['href'])
-        return None
+        with self.stats.time('parse'):
+            page = self.parser.parse(html, self.base_url)
+        self.stats.count('pages')
+        logger.info(f"Found {len(page.products)} products on page {page_no}")
+        return page
+
+    def _scrape_pages_parallel(self, page_urls: List[str], merger: 'PageMerger', progress):
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='amazon-page') as executor:
+            futures = {executor.submit(self._scrape_page, url, page_no): page_no
+                       for page_no, url in enumerate(page_urls, start=2)}
+            done = 1
+            for future in as_completed(futures):
+                page = future.result()
+                # A failed page still counts, so it does not hold back the pages after it
+                merger.add(futures[future], page.products if page else [])
+                done += 1
+                if progress:
+                    progress(done, merger.items_found)
+
+    def _scrape_pages_sequential(self, next_url: str, max_pages: int, merger: 'PageMerger', progress):
+        current_url = next_url
+        current_page = 2
+        while current_url and current_page <= max_pages:
+            page = self._scrape_page(current_url, current_page)
+            if page is None:
+                break
+            merger.add(current_page, page.products)
+            if progress:
+                progress(current_page, merger.items_found)
+            current_url = page.next_url
+            current_page += 1
+
+    def scrape_amazon(self, search_query: str, max_pages: int = 1,
+                      progress: Optional[Callable[[int, int], None]] = None, sink=None,
+                      stats: Optional[ScrapeStats] = None, archive=None) -> List[Product]:
+        """Scrape up to ``max_pages`` result pages.
 
-    def scrape_amazon(self, search_query: str, max_pages: int = 1) -> List[Product]:
+        Page 1 is loaded first to learn the pagination; the remaining pages are
+        then fetched concurrently by ``self.concurrency`` browsers, spaced out by
+        the adaptive per-host rate limiter. ``progress(pages_done, items_found)``
+        is called after every page. Products are handed to ``sink.write`` (an
+        ExportSink) in page order as soon as every earlier page is in, and are
+        then not returned; without a sink they are returned. A blocked page is
+        retried after a backoff, and if the scrape still fails part way, the
+        products found so far are kept. Time spent sleeping for the rate
+        limiter, fetching over HTTP, starting and loading pages in the browser
+        and parsing is added to ``stats`` (a ScrapeStats), along with CAPTCHA,
+        timeout and retry counts, and every fetched page's HTML is
+        handed to ``archive.add`` (an ArchiveRecorder) for later re-parsing.
+        """
         if not search_query:
             return []
             
-        all_products = []
-        current_page = 1
-        current_url = search_query  # Use the full URL provided
+        if stats is not None:
+            self.stats = stats
+        self.archive = archive
+        merger = PageMerger(sink)
+        # Resolve product and pagination links against the host actually searched
+        parsed = urlparse(search_query)
+        if parsed.scheme and parsed.netloc:
+            self.base_url = f"{parsed.scheme}://{parsed.netloc}"
         
         try:
-            while current_url and current_page <= max_pages:
-                logger.info(f"Scraping page {current_page}")
-                html = self._get_page(current_url)
-                if not html:
-                    break
-
-                soup = BeautifulSoup(html, 'html.parser')
-                items = soup.select('div.s-result-item[data-component-type="s-search-result"]')
-                
-                page_products = []
-                for item in items:
-                    product = self._extract_product_data(item)
-                    if product:
-                        page_products.append(product)
-                
-                all_products.extend(page_products)
-                logger.info(f"Found {len(page_products)} products on page {current_page}")
-
-                # Get next page URL
-                current_url = self._get_next_page_url(soup)
-                current_page += 1
-                
-                if not current_url:
-                    break
-                    
-                self._random_delay()
-
-            # Save the results
-            if all_products:
-                # Ensure output directory exists
-                os.makedirs('output', exist_ok=True)
-                
-                # Save as CSV
-                df = pd.DataFrame([p.__dict__ for p in all_products])
-                df.to_csv('output/amazon_products.csv', index=False)
-                logger.info(f"Saved {len(all_products)} products to CSV")
-                
-                # Save as Excel
-                df.to_excel('output/amazon_products.xlsx', index=False)
-                logger.info(f"Saved {len(all_products)} products to Excel")
-                
-                # Save as JSON
-                with open('output/amazon_products.json', 'w', encoding='utf-8') as f:
-                    json.dump([p.__dict__ for p in all_products], f, indent=2)
-                logger.info(f"Saved {len(all_products)} products to JSON")
-
-            return all_products
+            first = self._scrape_page(search_query, 1)  # Use the full URL provided
+            if first is None:
+                return []
+            merger.add(1, first.products)
+            if progress:
+                progress(1, merger.items_found)
+
+            if max_pages > 1 and first.next_url:
+                page_urls = []
+                if first.last_page:
+                    page_urls = self._build_page_urls(first.next_url, first.last_page, max_pages)
+                if page_urls:
+                    self._scrape_pages_parallel(page_urls, merger, progress)
+                else:
+                    # Pagination we cannot predict: follow the "next" links one by one
+                    self._scrape_pages_sequential(first.next_url, max_pages, merger, progress)
+
+            return merger.finish()
 
         except Exception as e:
             logger.error(f"Error during scraping: {e}")
-            return []
+            self.stats.count('errors')
+            return merger.finish()
         finally:
             self.close()
 
     def close(self):
-        self.driver.quit()
\ No newline at end of file
+        if self._owns_pool:
+            self.pool.close()
\ No newline at end of file
@@ -0,0 +1,264 @@
+"""Compressed, content-addressed archive of every page the scrapers fetched.
+
+Pages are stored once per distinct content as ``objects/<sha256[:2]>/<sha256>.html.gz``;
+``jobs/<job id>.ndjson`` lists the pages each job fetched, in order. ``reparse``
+runs the current extractors over archived pages in a pool of processes, with
+no network or browser, so a markup fix can be applied to past scrapes.
+
+Command line (from the app directory):
+
+    python -m scrapers.archive reparse [--since-days 7] [--kind amazon] [--out reparsed/]
+    python -m scrapers.archive prune --older-than-days 30
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Iterator, List, Optional
+from urllib.parse import urlparse
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Processes a re-parse uses unless told otherwise, so one job does not take every core
+DEFAULT_WORKERS = min(os.cpu_count() or 1, 4)
+
+
+@dataclass
+class ArchivedPage:
+    digest: str
+    job_id: str
+    kind: str  # 'amazon' or 'youtube'
+    query: str
+    url: str
+    page_no: int
+    fetched_at: float
+    size: int
+
+
+class ArchiveRecorder:
+    """Adds the pages of one job to the archive; handed to the scrapers as ``archive``."""
+
+    def __init__(self, archive: 'PageArchive', job_id: str, kind: str, query: str):
+        self.archive = archive
+        self.job_id = job_id
+        self.kind = kind
+        self.query = query
+
+    def add(self, html: str, url: str, page_no: int = 1):
+        try:
+            self.archive.put(html, ArchivedPage(
+                digest='', job_id=self.job_id, kind=self.kind, query=self.query,
+                url=url, page_no=page_no, fetched_at=time.time(), size=0))
+        except OSError as e:
+            # The archive is a convenience; a full disk must not fail the scrape
+            logger.error(f"Could not archive {url}: {e}")
+
+
+class PageArchive:
+    def __init__(self, root: str = 'archive'):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, 'objects', digest[:2], f'{digest}.html.gz')
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.root, 'jobs', f'{job_id}.ndjson')
+
+    def recorder(self, job_id: str, kind: str, query: str) -> ArchiveRecorder:
+        return ArchiveRecorder(self, job_id, kind, query)
+
+    def _compress(self, data: bytes, path: str) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+        with gzip.open(tmp, 'wb', compresslevel=6) as f:
+            f.write(data)
+        return tmp
+
+    def put(self, html: str, page: ArchivedPage) -> str:
+        """Store ``html`` (once per distinct content) and record ``page`` under its job; returns the digest."""
+        data = html.encode('utf-8')
+        page.digest = hashlib.sha256(data).hexdigest()
+        page.size = len(data)
+        path = self._object_path(page.digest)
+        # Compressed outside the lock; stored and recorded under it, so prune never sees one without the other
+        tmp = self._compress(data, path) if not os.path.exists(path) else None
+
+        job_path = self._job_path(page.job_id)
+        with self._lock:
+            if tmp:
+                os.replace(tmp, path)
+            elif not os.path.exists(path):
+                os.replace(self._compress(data, path), path)
+            os.makedirs(os.path.dirname(job_path), exist_ok=True)
+            with open(job_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(asdict(page)) + '\n')
+        return page.digest
+
+    def get(self, digest: str) -> str:
+        with gzip.open(self._object_path(digest), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def has_pages(self, job_id: str) -> bool:
+        return os.path.exists(self._job_path(job_id))
+
+    def pages(self, job_id: Optional[str] = None, kind: Optional[str] = None,
+              since: Optional[float] = None) -> Iterator[ArchivedPage]:
+        """Archived pages, job by job, optionally only one job, one kind or fetched after ``since``."""
+        if job_id:
+            paths = [self._job_path(job_id)]
+        else:
+            jobs_dir = os.path.join(self.root, 'jobs')
+            names = os.listdir(jobs_dir) if os.path.isdir(jobs_dir) else []
+            paths = [os.path.join(jobs_dir, name) for name in sorted(names) if name.endswith('.ndjson')]
+        for path in paths:
+            # A job's file is last written when its last page is, so older files can be skipped whole
+            if since and os.path.exists(path) and os.path.getmtime(path) < since:
+                continue
+            try:
+                with open(path, encoding='utf-8') as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        page = ArchivedPage(**json.loads(line))
+                        if (kind and page.kind != kind) or (since and page.fetched_at < since):
+                            continue
+                        yield page
+            except FileNotFoundError:
+                continue
+
+    def prune(self, older_than: float) -> int:
+        """Delete jobs fetched before ``older_than`` and the pages no remaining job uses; returns jobs removed."""
+        removed = 0
+        with self._lock:
+            jobs_dir = os.path.join(self.root, 'jobs')
+            if not os.path.isdir(jobs_dir):
+                return 0
+            for name in os.listdir(jobs_dir):
+                path = os.path.join(jobs_dir, name)
+                if os.path.getmtime(path) < older_than:
+                    os.remove(path)
+                    removed += 1
+            live = {page.digest for page in self.pages()}
+            objects_dir = os.path.join(self.root, 'objects')
+            for directory, _, files in os.walk(objects_dir, topdown=False):
+                for name in files:
+                    if name.endswith('.html.gz') and name[:-len('.html.gz')] not in live:
+                        os.remove(os.path.join(directory, name))
+                if directory != objects_dir and not os.listdir(directory):
+                    os.rmdir(directory)
+        if removed:
+            logger.info(f"Removed {removed} archived jobs")
+        return removed
+
+
+_parsers = {}
+
+
+def parse_archived(root: str, page: ArchivedPage, parser: Optional[str] = None) -> List[dict]:
+    """Rows the current extractor finds in one archived page. Runs in worker processes."""
+    from scrapers.amazon_parsers import get_parser
+    from scrapers.youtube_scraper import parse_videos_html
+
+    html = PageArchive(root).get(page.digest)
+    if page.kind == 'youtube':
+        # Relative upload dates ("3 weeks ago") are as of when the page was fetched, not now
+        return [dict(video, seen_at=page.fetched_at) for video in parse_videos_html(html)]
+    if parser not in _parsers:
+        _parsers[parser] = get_parser(parser)
+    parsed = urlparse(page.url)
+    products = _parsers[parser].parse(html, f"{parsed.scheme}://{parsed.netloc}").products
+    return [asdict(product) for product in products]
+
+
+def reparse(archive: PageArchive, pages: List[ArchivedPage], workers: Optional[int] = None,
+            parser: Optional[str] = None) -> Iterator[tuple]:
+    """Yield ``(page, rows)`` for every page, in order, parsed across ``workers`` processes.
+
+    The workers are spawned rather than forked: this runs on a thread of the
+    web server, and a forked child can inherit a lock another thread holds
+    (logging, the driver pool, the sweeper) and deadlock on it.
+    """
+    if not pages:
+        return
+    workers = workers or DEFAULT_WORKERS
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        # Big chunks keep the per-page inter-process overhead small
+        chunksize = max(1, len(pages) // (workers * 4))
+        results = executor.map(parse_archived, [archive.root] * len(pages), pages, [parser] * len(pages),
+                               chunksize=chunksize)
+        yield from zip(pages, results)
+
+
+def reparse_job(archive: PageArchive, job_id: str, sink, workers: Optional[int] = None,
+                parser: Optional[str] = None) -> int:
+    """Re-extract one job into ``sink`` (an ExportSink), deduplicated as the scrapers do; returns pages parsed."""
+    pages = sorted(archive.pages(job_id=job_id), key=lambda p: (p.page_no, p.fetched_at))
+    seen = set()
+    for page, rows in reparse(archive, pages, workers, parser):
+        keys = ('asin', 'url') if page.kind == 'amazon' else ('video_id', 'title')
+        fresh = []
+        for row in rows:
+            row_key = next((row[key] for key in keys if row.get(key)), None)
+            if row_key not in seen:
+                seen.add(row_key)
+                fresh.append(row)
+        sink.write(fresh)
+    return len(pages)
+
+
+def main():
+    from scrapers.export import ExportSink
+    from scrapers.amazon_scraper import PRODUCT_FIELDS
+    from scrapers.youtube_scraper import VIDEO_FIELDS
+
+    arg_parser = argparse.ArgumentParser(description="Re-parse or prune the raw page archive")
+    arg_parser.add_argument('command', choices=('reparse', 'prune'))
+    arg_parser.add_argument('--root', default=os.environ.get('PAGE_ARCHIVE_DIR', 'archive'))
+    arg_parser.add_argument('--since-days', type=float, help="only pages fetched in the last N days")
+    arg_parser.add_argument('--older-than-days', type=float, default=30, help="prune: age of jobs to delete")
+    arg_parser.add_argument('--kind', choices=('amazon', 'youtube'))
+    arg_parser.add_argument('--job', help="only this job id")
+    arg_parser.add_argument('--parser', help="Amazon parser engine (lxml or soup)")
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="processes to use (all cores by default)")
+    arg_parser.add_argument('--out', default='reparsed', help="directory for <job id>.ndjson results")
+    args = arg_parser.parse_args()
+
+    archive = PageArchive(args.root)
+    if args.command == 'prune':
+        removed = archive.prune(time.time() - args.older_than_days * 86400)
+        print(f"Removed {removed} archived jobs")
+        return
+
+    since = time.time() - args.since_days * 86400 if args.since_days else None
+    pages = sorted(archive.pages(job_id=args.job, kind=args.kind, since=since),
+                   key=lambda p: (p.job_id, p.page_no, p.fetched_at))
+    started = time.perf_counter()
+    sinks = {}
+    rows = 0
+    try:
+        for page, found in reparse(archive, pages, args.workers, args.parser):
+            if page.job_id not in sinks:
+                fields = PRODUCT_FIELDS if page.kind == 'amazon' else VIDEO_FIELDS
+                sinks[page.job_id] = ExportSink(os.path.join(args.out, page.job_id), fields, formats=('ndjson',))
+            sinks[page.job_id].write(found)
+            rows += len(found)
+    finally:
+        for sink in sinks.values():
+            sink.close()
+    elapsed = time.perf_counter() - started
+    print(f"Re-parsed {len(pages)} pages from {len(sinks)} jobs into {rows} rows in {elapsed:.1f}s "
+          f"({len(pages) / elapsed if elapsed else 0:.1f} pages/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+_SHORTS_PATH = re.compile(r'^/shorts/([\w-]+)')
+_CHANNEL_TABS = ('videos', 'shorts', 'streams', 'featured')
+
+
+def video_id_from_href(href: Optional[str]) -> Optional[str]:
+    """YouTube video ID from a ``/watch?v=...`` or ``/shorts/...`` link."""
+    if not href:
+        return None
+    parsed = urlparse(href)
+    ids = parse_qs(parsed.query).get('v')
+    if ids:
+        return ids[0]
+    match = _SHORTS_PATH.match(parsed.path)
+    return match.group(1) if match else None
+
+
+def channel_key(url: str) -> str:
+    """Stable name for a channel, whatever tab or query string its URL carries."""
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith('www.') or host.startswith('m.'):
+        host = host.split('.', 1)[1]
+    parts = [p for p in parsed.path.split('/') if p]
+    if parts and parts[-1] in _CHANNEL_TABS:
+        parts = parts[:-1]
+    return f"{host}/{'/'.join(parts)}".lower()
+
+
+class ChannelIndex:
+    """Videos already seen per channel, newest first, stored as ``root/<channel>.json``.
+
+    Lets a re-scrape stop at the first video it has seen before. The first
+    ``complete_until`` stored videos are a run that is contiguous from the top
+    of the channel's feed, and only those are stop points, so stopping at a
+    known video never skips one. A re-scrape that ends (on a limit, a stall or
+    a timeout) before it reaches a known video leaves a gap under its new
+    videos; the older videos are kept after the gap but are not used until a
+    later scrape scrolls down to them again. ``reached_end`` records whether
+    that run goes all the way to the bottom of the feed; if it doesn't, a
+    scrape that wants more than the run holds has to scroll past it.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def _path(self, url: str) -> str:
+        key = channel_key(url)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.root, f'{digest}.json')
+
+    def lock(self, url: str) -> threading.Lock:
+        """Held around a scrape and its ``update`` so two re-scrapes of a channel don't interleave."""
+        key = channel_key(url)
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _read(self, url: str) -> Tuple[List[dict], int, bool]:
+        """The stored videos, how many of them are contiguous from the top, and whether those reach the end."""
+        try:
+            with open(self._path(url), encoding='utf-8') as f:
+                data = json.load(f)
+            videos = data['videos']
+            return (videos, min(data.get('complete_until', len(videos)), len(videos)),
+                    bool(data.get('reached_end', False)))
+        except FileNotFoundError:
+            return [], 0, False
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable channel index for {url}: {e}")
+            return [], 0, False
+
+    def load(self, url: str) -> List[dict]:
+        return self._read(url)[0]
+
+    def head(self, url: str) -> Tuple[List[dict], bool]:
+        """The run a re-scrape may stop at, contiguous from the top, and whether it reaches the end of the feed."""
+        videos, complete_until, reached_end = self._read(url)
+        return videos[:complete_until], reached_end
+
+    def update(self, url: str, new_videos: List[dict], reached_known: bool, reached_end: bool) -> List[dict]:
+        """Put ``new_videos`` (newest first) in front of the stored ones.
+
+        Returns the stored videos that follow the new ones without a gap:
+        the contiguous run if the scrape reached a known video, else none,
+        since whatever lies between the two runs was never seen.
+        ``reached_end`` says whether the scrape scrolled to the end of the feed.
+        """
+        seen_at = time.time()
+        fresh = [dict(v, seen_at=seen_at) for v in new_videos if v.get('video_id')]
+        stored, complete_until, stored_end = self._read(url)
+        fresh_ids = {v['video_id'] for v in fresh}
+        following = [v for v in stored[:complete_until] if v['video_id'] not in fresh_ids] if reached_known else []
+        rest = [v for v in stored if v['video_id'] not in fresh_ids]
+        videos = fresh + rest
+        complete_until = len(fresh) + len(following)
+        # Reaching a known video hands the rest of the run over to the stored one
+        reached_end = stored_end if reached_known else reached_end
+
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(url)
+        tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'channel': channel_key(url), 'updated_at': seen_at, 'complete_until': complete_until,
+                       'reached_end': reached_end, 'videos': videos}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        return following
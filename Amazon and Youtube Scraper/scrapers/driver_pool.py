@@ -0,0 +1,298 @@
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import List, Optional
+import atexit
+import logging
+import os
+import threading
+import time
+from scrapers.rate_limit import Blocked
+
+try:
+    import psutil
+except ImportError:  # RSS based recycling is skipped without psutil
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# The extractors only read text and attributes, so none of this needs to load
+MEDIA_URL_PATTERNS = [
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.mp4', '*.webm', '*.m4s', '*googlevideo.com/videoplayback*',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+]
+TRACKER_URL_PATTERNS = [
+    '*doubleclick.net*', '*google-analytics.com*', '*googletagmanager.com*', '*googlesyndication.com*',
+    '*googleadservices.com*', '*amazon-adsystem.com*', '*fls-eu.amazon.*', '*fls-na.amazon.*',
+    '*unagi.amazon.*', '*scorecardresearch.com*', '*facebook.net*',
+    '*youtube.com/api/stats/*', '*youtube.com/ptracking*', '*youtube.com/pagead/*',
+]
+# Resource policy name -> blocked URL patterns
+RESOURCE_POLICIES = {
+    'none': [],
+    'media': MEDIA_URL_PATTERNS,
+    'strict': MEDIA_URL_PATTERNS + TRACKER_URL_PATTERNS,
+}
+
+# Resource timing keeps 250 entries by default, too few for a YouTube feed
+_TIMING_BUFFER_JS = "performance.setResourceTimingBufferSize(10000);"
+
+# Requests and bytes of the current page so far. Cross-origin responses without
+# Timing-Allow-Origin report a transferSize of 0, so this is a lower bound.
+PAGE_LOAD_JS = """
+const nav = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+let bytes = nav ? nav.transferSize : 0;
+for (const r of resources) bytes += r.transferSize;
+return {
+    requests: resources.length + 1,
+    bytes: bytes,
+    dom_ready: nav ? nav.domContentLoadedEventEnd / 1000 : null
+};
+"""
+
+
+def chrome_options(headless: bool = True, block: str = 'none', page_load_strategy: str = 'normal') -> Options:
+    """Chrome options; ``block`` names a RESOURCE_POLICIES entry.
+
+    Any policy other than 'none' also turns images off in the content
+    settings, which stops them before a request is even made.
+    ``page_load_strategy='eager'`` returns from ``get()`` once the DOM is
+    ready; both scrapers wait for the elements they need afterwards anyway.
+    """
+    options = Options()
+    options.page_load_strategy = page_load_strategy
+    if block != 'none':
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--autoplay-policy=user-gesture-required")
+    if headless:
+        options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--log-level=3")  # Suppress WebGL warnings
+    options.add_argument("--silent")
+    options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    options.add_argument(f"user-agent={USER_AGENT}")
+    return options
+
+
+def apply_resource_policy(driver: webdriver.Chrome, block: str):
+    """Block the policy's URL patterns in the browser's network layer (Chrome DevTools Protocol)."""
+    try:
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': _TIMING_BUFFER_JS})
+        if RESOURCE_POLICIES[block]:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': RESOURCE_POLICIES[block]})
+    except WebDriverException as e:
+        logger.warning(f"Could not apply resource policy {block!r}: {e}")
+
+
+def log_page_load(driver: webdriver.Chrome, url: str, seconds: float, stats=None):
+    """Log what loading ``url`` cost and add it to ``stats`` (a ScrapeStats)."""
+    try:
+        load = driver.execute_script(PAGE_LOAD_JS)
+    except WebDriverException:
+        return
+    if not load:
+        return
+    logger.info(f"Loaded {url} in {seconds:.2f}s: {load['requests']} requests, "
+                f"{load['bytes'] / 1024:.0f} KB transferred")
+    if stats is not None:
+        stats.count('browser_requests', load['requests'])
+        stats.count('browser_kb', round(load['bytes'] / 1024))
+
+
+@dataclass
+class PooledDriver:
+    driver: webdriver.Chrome
+    created_at: float = field(default_factory=time.time)
+    pages: int = 0
+
+    def rss_mb(self) -> Optional[float]:
+        """Resident memory of chromedriver plus every Chrome process it spawned."""
+        if psutil is None:
+            return None
+        try:
+            root = psutil.Process(self.driver.service.process.pid)
+            procs = [root] + root.children(recursive=True)
+            return sum(p.memory_info().rss for p in procs) / (1024 * 1024)
+        except (psutil.Error, AttributeError):
+            return None
+
+    def is_healthy(self) -> bool:
+        try:
+            return self.driver.execute_script("return 1") == 1
+        except WebDriverException:
+            return False
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except WebDriverException as e:
+            logger.warning(f"Error closing browser: {e}")
+
+
+class DriverPool:
+    """A bounded pool of reusable Chrome drivers.
+
+    Drivers are leased with ``lease()`` and handed back when the block exits.
+    A driver is recycled once it has served ``max_pages`` leases, grown past
+    ``max_rss_mb`` of memory or failed a health check. Every driver blocks the
+    resources of the ``block`` policy (see RESOURCE_POLICIES). ``starts`` and
+    ``recycles`` count drivers started and retired over the pool's lifetime.
+    """
+
+    def __init__(self, max_size: int = 2, headless: bool = True,
+                 max_pages: int = 50, max_rss_mb: Optional[float] = 1024,
+                 block: str = 'strict', page_load_strategy: str = 'eager'):
+        if block not in RESOURCE_POLICIES:
+            raise ValueError(f"Unknown resource policy {block!r}, expected one of {tuple(RESOURCE_POLICIES)}")
+        self.max_size = max_size
+        self.headless = headless
+        self.block = block
+        self.page_load_strategy = page_load_strategy
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle: List[PooledDriver] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.starts = 0
+        self.recycles = 0
+
+    @property
+    def idle(self) -> int:
+        with self._lock:
+            return len(self._idle)
+
+    def _create(self) -> PooledDriver:
+        started = time.time()
+        driver = webdriver.Chrome(options=chrome_options(self.headless, self.block, self.page_load_strategy))
+        apply_resource_policy(driver, self.block)
+        logger.info(f"Started browser in {time.time() - started:.1f}s (blocking: {self.block})")
+        with self._lock:
+            self.starts += 1
+        return PooledDriver(driver)
+
+    def _worn_out(self, pooled: PooledDriver) -> bool:
+        if pooled.pages >= self.max_pages:
+            return True
+        if self.max_rss_mb is not None:
+            rss = pooled.rss_mb()
+            if rss is not None and rss > self.max_rss_mb:
+                logger.info(f"Recycling browser using {rss:.0f} MB")
+                return True
+        return False
+
+    def warm(self, count: Optional[int] = None):
+        """Start up to ``count`` drivers ahead of time so the first scrapes skip the cold start."""
+        count = min(count or self.max_size, self.max_size)
+        leased = []
+        try:
+            for _ in range(count):
+                leased.append(self.acquire())
+        finally:
+            for pooled in leased:
+                self.release(pooled, count_page=False)
+
+    def acquire(self, timeout: Optional[float] = None, stats=None) -> PooledDriver:
+        """Lease a driver; time waiting for a free slot and starting Chrome is added to ``stats`` (a ScrapeStats)."""
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("Timed out waiting for a free browser")
+        if stats is not None:
+            stats.add_time('driver_wait', time.perf_counter() - started)
+        try:
+            while True:
+                with self._lock:
+                    pooled = self._idle.pop() if self._idle else None
+                if pooled is None:
+                    if stats is None:
+                        return self._create()
+                    stats.count('driver_starts')
+                    with stats.time('driver_start'):
+                        return self._create()
+                if pooled.is_healthy():
+                    return pooled
+                logger.info("Discarding unhealthy browser")
+                pooled.quit()
+                with self._lock:
+                    self.recycles += 1
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, pooled: PooledDriver, discard: bool = False, count_page: bool = True):
+        try:
+            if count_page:
+                pooled.pages += 1
+            if discard or self._closed or self._worn_out(pooled):
+                pooled.quit()
+                with self._lock:
+                    self.recycles += 1
+                return
+            try:
+                # Stop whatever the last page was doing before the driver sits idle
+                pooled.driver.get("about:blank")
+            except WebDriverException:
+                pooled.quit()
+                return
+            with self._lock:
+                self._idle.append(pooled)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None, stats=None):
+        pooled = self.acquire(timeout, stats)
+        discard = False
+        try:
+            yield pooled.driver
+        except WebDriverException:
+            # Timeouts and missing elements leave the browser usable; a dead session does not
+            discard = not pooled.is_healthy()
+            raise
+        except Blocked:
+            # The target flagged this browser's session; retries start in a fresh one
+            discard = True
+            raise
+        finally:
+            self.release(pooled, discard=discard)
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            pooled.quit()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> DriverPool:
+    """The process-wide headless pool shared by both scrapers."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            max_rss = os.environ.get('DRIVER_MAX_RSS_MB', '1024')
+            _default_pool = DriverPool(
+                max_size=int(os.environ.get('DRIVER_POOL_SIZE', 2)),
+                max_pages=int(os.environ.get('DRIVER_MAX_PAGES', 50)),
+                max_rss_mb=float(max_rss) if max_rss else None,
+                block=os.environ.get('BROWSER_BLOCK', 'strict'),
+                page_load_strategy=os.environ.get('BROWSER_PAGE_LOAD', 'eager'),
+            )
+            atexit.register(_default_pool.close)
+        return _default_pool
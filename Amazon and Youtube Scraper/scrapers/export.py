@@ -0,0 +1,234 @@
+from openpyxl import Workbook
+from typing import Iterable, Iterator, List, Sequence
+import csv
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'ndjson', 'json', 'xlsx')
+
+
+class ExportSink:
+    """Streams result rows to ``<base_path>.<format>`` files as batches arrive.
+
+    CSV, NDJSON and JSON rows are flushed to disk after every batch, so a
+    crash mid-scrape keeps everything written so far (NDJSON and CSV stay
+    valid; the JSON array is only closed by ``close()``). XLSX uses openpyxl's
+    write-only workbook, which keeps memory flat but is saved on ``close()``.
+    """
+
+    def __init__(self, base_path: str, fieldnames: Sequence[str], formats: Iterable[str] = FORMATS):
+        self.base_path = base_path
+        self.fieldnames = list(fieldnames)
+        self.formats = tuple(formats)
+        self.rows_written = 0
+        self._files = []
+        self._closed = False
+
+        directory = os.path.dirname(base_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._csv = self._json = self._ndjson = self._workbook = None
+        if 'csv' in self.formats:
+            f = self._open('csv', newline='')
+            self._csv = csv.DictWriter(f, fieldnames=self.fieldnames, extrasaction='ignore')
+            self._csv.writeheader()
+        if 'ndjson' in self.formats:
+            self._ndjson = self._open('ndjson')
+        if 'json' in self.formats:
+            self._json = self._open('json')
+            self._json.write('[')
+        if 'xlsx' in self.formats:
+            self._workbook = Workbook(write_only=True)
+            self._sheet = self._workbook.create_sheet()
+            self._sheet.append(self.fieldnames)
+        self.flush()
+
+    def _open(self, ext: str, **kwargs):
+        f = open(self.path(ext), 'w', encoding='utf-8', **kwargs)
+        self._files.append(f)
+        return f
+
+    def path(self, ext: str) -> str:
+        return f'{self.base_path}.{ext}'
+
+    def write(self, rows: List[dict]):
+        """Append one page or scroll batch of rows."""
+        if not rows:
+            return
+        for row in rows:
+            if self._csv:
+                self._csv.writerow(row)
+            if self._ndjson:
+                self._ndjson.write(json.dumps(row, ensure_ascii=False) + '\n')
+            if self._json:
+                self._json.write(('\n' if self.rows_written == 0 else ',\n') + json.dumps(row, ensure_ascii=False))
+            if self._workbook:
+                self._sheet.append([row.get(name) for name in self.fieldnames])
+            self.rows_written += 1
+        self.flush()
+
+    def flush(self):
+        for f in self._files:
+            f.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._json:
+            self._json.write('\n]\n')
+        for f in self._files:
+            f.close()
+        if self._workbook:
+            self._workbook.save(self.path('xlsx'))
+        logger.info(f"Saved {self.rows_written} rows to {self.base_path}.{{{','.join(self.formats)}}}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TeeSink:
+    """Hands every batch to several sinks; ``rows_written`` and ``path`` come from the first."""
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    @property
+    def rows_written(self) -> int:
+        return self.sinks[0].rows_written
+
+    def path(self, ext: str) -> str:
+        return self.sinks[0].path(ext)
+
+    def write(self, rows: List[dict]):
+        for sink in self.sinks:
+            sink.write(rows)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TimedSink:
+    """Wraps a sink and adds the time spent in its ``write`` and ``close`` to ``stats`` (a ScrapeStats)."""
+
+    def __init__(self, sink, stats):
+        self.sink = sink
+        self.stats = stats
+
+    @property
+    def rows_written(self) -> int:
+        return self.sink.rows_written
+
+    def path(self, ext: str) -> str:
+        return self.sink.path(ext)
+
+    def write(self, rows: List[dict]):
+        with self.stats.time('export'):
+            self.sink.write(rows)
+
+    def close(self):
+        with self.stats.time('export'):
+            self.sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SharedSink:
+    """One sink written by several concurrent scrapes, each through its own ``writer()``.
+
+    Writers tag their rows with extra columns (such as the query they came
+    from) and count their own rows; closing a writer leaves the shared sink
+    open for the others, so its owner closes it once every scrape is done.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self._lock = threading.Lock()
+
+    @property
+    def rows_written(self) -> int:
+        return self.sink.rows_written
+
+    def path(self, ext: str) -> str:
+        return self.sink.path(ext)
+
+    def writer(self, **tags) -> 'SharedWriter':
+        return SharedWriter(self, tags)
+
+    def write(self, rows: List[dict]):
+        with self._lock:
+            self.sink.write(rows)
+
+    def close(self):
+        with self._lock:
+            self.sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SharedWriter:
+    def __init__(self, shared: SharedSink, tags: dict):
+        self.shared = shared
+        self.tags = tags
+        self.rows_written = 0
+
+    def path(self, ext: str) -> str:
+        return self.shared.path(ext)
+
+    def write(self, rows: List[dict]):
+        if not rows:
+            return
+        self.shared.write([{**self.tags, **row} for row in rows])
+        self.rows_written += len(rows)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_ndjson(path: str) -> Iterator[dict]:
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def convert_ndjson(src: str, base_path: str, fmt: str, fieldnames: Sequence[str], batch_size: int = 1000) -> str:
+    """Stream the rows of an NDJSON file into ``<base_path>.<fmt>`` and return that path."""
+    with ExportSink(base_path, fieldnames, formats=(fmt,)) as sink:
+        batch = []
+        for row in iter_ndjson(src):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                sink.write(batch)
+                batch = []
+        sink.write(batch)
+    return sink.path(fmt)
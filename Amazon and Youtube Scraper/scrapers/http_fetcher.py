@@ -0,0 +1,97 @@
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Optional
+import logging
+import os
+import threading
+from scrapers.driver_pool import USER_AGENT
+from scrapers.rate_limit import Blocked
+
+logger = logging.getLogger(__name__)
+
+CAPTCHA_MARKERS = ("api-services-support@amazon.com", "/errors/validateCaptcha")
+RESULT_MARKER = 'data-component-type="s-search-result"'
+# Markup of a search that matched nothing; a real answer, not a page to retry
+NO_RESULTS_MARKERS = ('data-component-type="s-no-results', 'class="s-no-results', '>No results for')
+# Statuses Amazon answers with when it is throttling a client
+THROTTLE_STATUSES = (429, 503)
+
+
+def is_no_results(html: str) -> bool:
+    """Whether ``html`` is Amazon's page for a search that matched nothing."""
+    return any(marker in html for marker in NO_RESULTS_MARKERS)
+
+
+class HttpFetcher:
+    """Fetches search result pages over a pooled keep-alive HTTP session.
+
+    ``fetch`` returns ``None`` whenever the plain HTML is not good enough
+    (error status, no result cards, i.e. the grid is rendered by JavaScript;
+    a "No results" page is returned as it is)
+    so the caller can retry the page in a real browser, and raises ``Blocked``
+    on a CAPTCHA or throttling status so the caller can back off first.
+    """
+
+    def __init__(self, pool_size: int = 10, timeout: float = 15):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-IN,en;q=0.9',
+        })
+
+    def fetch(self, url: str, stats=None) -> Optional[str]:
+        """The page's HTML, or ``None``; CAPTCHAs and timeouts are counted in ``stats`` (a ScrapeStats)."""
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.Timeout as e:
+            logger.info(f"HTTP fetch timed out for {url}: {e}")
+            if stats is not None:
+                stats.count('timeouts')
+            return None
+        except requests.RequestException as e:
+            logger.info(f"HTTP fetch failed for {url}: {e}")
+            return None
+
+        if response.status_code in THROTTLE_STATUSES:
+            raise Blocked(f"HTTP status {response.status_code}")
+        if response.status_code != 200:
+            logger.info(f"HTTP fetch got status {response.status_code} for {url}")
+            return None
+
+        html = response.text
+        if any(marker in html for marker in CAPTCHA_MARKERS):
+            if stats is not None:
+                stats.count('captchas')
+            raise Blocked("CAPTCHA")
+        if RESULT_MARKER not in html:
+            if is_no_results(html):
+                logger.info(f"No results for {url}")
+                return html
+            logger.info(f"HTTP fetch found no result grid for {url}")
+            return None
+        return html
+
+    def rotate_session(self):
+        """Drop the cookies that tie later requests to a session the target has flagged."""
+        self.session.cookies.clear()
+
+    def close(self):
+        self.session.close()
+
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+
+def get_http_fetcher() -> HttpFetcher:
+    """The process-wide fetcher, so every scrape reuses the same open connections."""
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = HttpFetcher(pool_size=int(os.environ.get('HTTP_POOL_SIZE', 10)))
+        return _default_fetcher
@@ -0,0 +1,109 @@
+from datetime import datetime
+import functools
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+
+# Typed columns added next to the scraped text of each result
+TYPED_FIELDS = {
+    'amazon': ['price_paise', 'rating_value', 'review_count'],
+    'youtube': ['view_count', 'upload_ts'],
+}
+
+_NUMBER = r'(\d+(?:\.\d+)?)'
+_SCALE = {'': 1, 'K': 1e3, 'M': 1e6, 'B': 1e9, 'LAKH': 1e5, 'CRORE': 1e7}
+_UNIT_SECONDS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+    'week': 7 * 86400,
+    'month': 30 * 86400,
+    'year': 365 * 86400,
+}
+
+
+def _distinct(parse):
+    """Run ``parse`` over the distinct values of a column only and spread the result back by code.
+
+    Scraped text repeats a lot (the same prices, "1.2K views", "3 weeks ago"),
+    so this does the string work once per distinct value; the rest is numpy
+    indexing. Missing values come out as NaN.
+    """
+    @functools.wraps(parse)
+    def parse_column(column: pd.Series) -> np.ndarray:
+        codes, uniques = pd.factorize(column)
+        parsed = np.append(parse(pd.Series(uniques, dtype=object)).to_numpy(dtype='float64', na_value=np.nan),
+                           np.nan)
+        return parsed[codes]  # code -1 (missing) picks the trailing NaN
+    return parse_column
+
+
+def _text(column: pd.Series) -> pd.Series:
+    return column.astype(str).str.replace(',', '', regex=False)
+
+
+@_distinct
+def parse_numbers(column: pd.Series) -> pd.Series:
+    """First number in each value as float ("₹1,299.00" -> 1299.0), NaN where there is none."""
+    return _text(column).str.extract(_NUMBER, expand=False).astype('float64')
+
+
+@_distinct
+def parse_counts(column: pd.Series) -> pd.Series:
+    """Counts with an optional K/M/B suffix ("1.2M views", "(3.4K)"); "No views" is 0."""
+    parts = _text(column).str.upper().str.extract(_NUMBER + r'\s*(K|M|B|LAKH|CRORE)?')
+    counts = parts[0].astype('float64') * parts[1].fillna('').map(_SCALE).astype('float64')
+    return counts.mask(column.str.startswith('No view', na=False), 0.0).round()
+
+
+@_distinct
+def _ago_seconds(column: pd.Series) -> pd.Series:
+    parts = column.astype(str).str.extract(r'(\d+)\s+(second|minute|hour|day|week|month|year)s?\s+ago')
+    return parts[0].astype('float64') * parts[1].map(_UNIT_SECONDS).astype('float64')
+
+
+def parse_relative_dates(column: pd.Series, now) -> np.ndarray:
+    """Unix seconds for relative dates such as "3 weeks ago", measured back from ``now``.
+
+    ``now`` is a timestamp or an array of them (one per row).
+    """
+    return np.round(np.asarray(now, dtype='float64') - _ago_seconds(column))
+
+
+def _int_column(values: np.ndarray) -> pd.array:
+    return pd.array(np.round(values), dtype='Float64').astype('Int64')
+
+
+def normalize_products(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df['price_paise'] = _int_column(parse_numbers(df['price']) * 100)
+    df['rating_value'] = parse_numbers(df['rating'])
+    df['review_count'] = _int_column(parse_counts(df['reviews']))
+    return df
+
+
+def normalize_videos(df: pd.DataFrame, now: Optional[float] = None) -> pd.DataFrame:
+    """Adds view counts and upload times; a ``seen_at`` column, if any, is used as each row's ``now``."""
+    df = df.copy()
+    now = now if now is not None else datetime.now().timestamp()
+    if 'seen_at' in df:
+        now = df.pop('seen_at').astype('float64').fillna(now).to_numpy()
+    df['view_count'] = _int_column(parse_counts(df['views']))
+    df['upload_ts'] = _int_column(parse_relative_dates(df['upload_date'], now))
+    return df
+
+
+NORMALIZERS = {
+    'amazon': normalize_products,
+    'youtube': normalize_videos,
+}
+
+
+def normalize_rows(scraper: str, rows: List[dict]) -> List[dict]:
+    """Typed copy of one batch of scraped rows, with missing values as None."""
+    if not rows:
+        return []
+    df = NORMALIZERS[scraper](pd.DataFrame.from_records(rows))
+    # object dtype turns numpy scalars into plain Python values that json can write
+    return df.astype(object).where(df.notna(), None).to_dict('records')
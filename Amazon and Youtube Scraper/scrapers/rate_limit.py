@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import os
+import random
+import threading
+import time
+
+
+class Blocked(Exception):
+    """The target answered with a CAPTCHA, a throttling status or an empty result grid."""
+
+
+@dataclass
+class _HostState:
+    interval: float
+    next_slot: float = 0.0
+    strikes: int = 0  # Blocks in a row since the last clean response
+
+
+class HostRateLimiter:
+    """Spaces out requests to the same host across every thread that shares it.
+
+    Each host gets one request slot every ``interval`` seconds, plus up to
+    ``jitter`` seconds of random spread so the traffic does not look mechanical.
+
+    The interval adapts per host (additive increase, multiplicative decrease
+    of the request rate): it starts at ``start_interval``, every clean response
+    reported with ``success()`` adds ``speedup`` requests per second down to
+    ``min_interval``, and every ``blocked()`` doubles it up to ``max_interval``
+    and holds the host for a cooldown that doubles with each block in a row.
+    """
+
+    def __init__(self, min_interval: float = 1.0, jitter: float = 0.5, start_interval: Optional[float] = None,
+                 max_interval: float = 60.0, speedup: float = 0.05, cooldown: float = 5.0,
+                 max_cooldown: float = 300.0):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self.start_interval = max(start_interval if start_interval is not None else min_interval, min_interval)
+        self.max_interval = max(max_interval, self.start_interval)
+        self.speedup = speedup
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._hosts: Dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, url: str) -> _HostState:
+        host = urlparse(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = _HostState(self.start_interval)
+        return self._hosts[host]
+
+    def wait(self, url: str) -> float:
+        """Block until ``url``'s host may be hit again; returns the seconds slept."""
+        with self._lock:
+            state = self._state(url)
+            now = time.monotonic()
+            slot = max(now, state.next_slot)
+            state.next_slot = slot + state.interval + random.uniform(0, self.jitter)
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return max(delay, 0.0)
+
+    def success(self, url: str):
+        """A clean response from ``url``'s host: shorten its interval a little."""
+        with self._lock:
+            state = self._state(url)
+            state.strikes = 0
+            if state.interval > self.min_interval:
+                state.interval = max(self.min_interval, 1 / (1 / state.interval + self.speedup))
+
+    def blocked(self, url: str) -> float:
+        """``url``'s host pushed back: halve its rate and hold it; returns the cooldown in seconds."""
+        with self._lock:
+            state = self._state(url)
+            state.strikes += 1
+            state.interval = min(self.max_interval, max(state.interval, 0.1) * 2)
+            cooldown = min(self.max_cooldown, self.cooldown * 2 ** (state.strikes - 1))
+            state.next_slot = max(state.next_slot, time.monotonic() + cooldown)
+        return cooldown
+
+    def intervals(self) -> Dict[str, float]:
+        """The current request interval of every host seen so far."""
+        with self._lock:
+            return {host: state.interval for host, state in self._hosts.items()}
+
+
+_default_limiter = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_host_limiter() -> HostRateLimiter:
+    """The process-wide limiter, so concurrent jobs share each host's budget."""
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = HostRateLimiter(
+                min_interval=float(os.environ.get('HOST_MIN_INTERVAL', 0.25)),
+                jitter=float(os.environ.get('HOST_JITTER', 0.5)),
+                start_interval=float(os.environ.get('HOST_START_INTERVAL', 1.0)),
+                max_interval=float(os.environ.get('HOST_MAX_INTERVAL', 60)),
+                cooldown=float(os.environ.get('HOST_BLOCK_COOLDOWN', 5)),
+            )
+        return _default_limiter
@@ -0,0 +1,54 @@
+from collections import defaultdict
+from contextlib import contextmanager
+import threading
+import time
+
+MAX_SPANS = 5000  # Timeline entries kept per scrape; totals keep counting past this
+
+
+class ScrapeStats:
+    """Seconds spent per stage and event counters for a single scrape.
+
+    Every timed stage is also kept as a span (stage, start, duration, thread)
+    relative to when the stats were created, for the job timeline.
+    Safe to share between the worker threads of one scrape.
+    """
+
+    def __init__(self):
+        self.timings = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.spans = []
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def time(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - started)
+
+    def add_time(self, stage: str, seconds: float):
+        """Add ``seconds`` of ``stage`` that ended just now."""
+        end = time.perf_counter() - self.started
+        with self._lock:
+            self.timings[stage] += seconds
+            if seconds > 0 and len(self.spans) < MAX_SPANS:
+                self.spans.append((stage, end - seconds, seconds, threading.current_thread().name))
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'timings': {stage: round(seconds, 3) for stage, seconds in self.timings.items()},
+                'counters': dict(self.counters),
+            }
+
+    def timeline(self) -> list:
+        with self._lock:
+            return [{'stage': stage, 'start': round(start, 4), 'seconds': round(seconds, 4), 'thread': thread}
+                    for stage, start, seconds, thread in self.spans]
@@ -1,90 +1,289 @@
+import logging
+import re
 import time
-import random
-import pandas as pd
-import os
-from selenium import webdriver
+from datetime import date, datetime, timedelta
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import (
-    TimeoutException,
-    NoSuchElementException,
-    WebDriverException
-)
-
-def setup_driver():
-    options = Options()
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--window-size=1920,1080')
-    options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-    driver = webdriver.Chrome(options=options)
-    return driver
-
-def random_wait():
-    wait_time = random.uniform(2, 5)
-    time.sleep(wait_time)
-
-def scrape_youtube_videos(url):
+from selenium.common.exceptions import TimeoutException
+from scrapers.channel_index import video_id_from_href
+from scrapers.driver_pool import get_default_pool, log_page_load
+from scrapers.stats import ScrapeStats
+
+logger = logging.getLogger(__name__)
+
+# Returns every video renderer from index arguments[0] onwards in one round trip.
+# getElementsByTagName is a live collection, so indexing past the cursor does not
+# re-walk the renderers that were already extracted.
+EXTRACT_VIDEOS_JS = """
+const start = arguments[0];
+const renderers = document.getElementsByTagName('ytd-rich-item-renderer');
+const text = el => el ? (el.innerText || el.textContent || '').trim() : null;
+const videos = [];
+for (let i = start; i < renderers.length; i++) {
+    const renderer = renderers[i];
+    const meta = renderer.querySelectorAll('span.inline-metadata-item.style-scope.ytd-video-meta-block');
+    const link = renderer.querySelector('a#video-title-link, a#thumbnail');
+    videos.push({
+        title: text(renderer.querySelector('yt-formatted-string#video-title')),
+        views: meta.length > 0 ? text(meta[0]) : null,
+        upload_date: meta.length > 1 ? text(meta[1]) : null,
+        href: link ? link.getAttribute('href') : null
+    });
+}
+return {total: renderers.length, videos: videos};
+"""
+
+# Renderer count plus whether the feed still shows its continuation spinner
+FEED_STATE_JS = """
+return [
+    document.getElementsByTagName('ytd-rich-item-renderer').length,
+    document.getElementsByTagName('ytd-continuation-item-renderer').length > 0
+];
+"""
+
+VIDEO_FIELDS = ['video_id', 'title', 'views', 'upload_date']
+
+SCROLL_TIMEOUT = 10  # Seconds to wait for more videos after a scroll
+MAX_STALLS = 2  # Scrolls in a row that may time out while the spinner is still showing
+MAX_PENDING_PASSES = 3  # Passes a renderer may go without a title before it is skipped (ads, shelves)
+
+_RELATIVE_DATE = re.compile(r'(\d+)\s+(second|minute|hour|day|week|month|year)s?\s+ago')
+_UNIT_DAYS = {
+    'second': 1 / 86400,
+    'minute': 1 / 1440,
+    'hour': 1 / 24,
+    'day': 1,
+    'week': 7,
+    'month': 30,
+    'year': 365,
+}
+
+def parse_upload_date(text, now=None):
+    """Approximate datetime for YouTube's relative dates such as "3 weeks ago"."""
+    match = _RELATIVE_DATE.search(text or '')
+    if not match:
+        return None
+    amount, unit = int(match.group(1)), match.group(2)
+    return (now or datetime.now()) - timedelta(days=amount * _UNIT_DAYS[unit])
+
+def parse_videos_html(html):
+    """Videos in a saved channel page's DOM, the way EXTRACT_VIDEOS_JS reads them live."""
+    # Only re-parsing archived pages needs lxml, so live scrapes run without it
+    from lxml import html as lxml_html
+
+    tree = lxml_html.fromstring(html)
+    videos = []
+    seen = set()
+    for renderer in tree.iter('ytd-rich-item-renderer'):
+        title = renderer.xpath(".//yt-formatted-string[@id='video-title']")
+        meta = renderer.xpath(".//span[contains(concat(' ', normalize-space(@class), ' '), ' inline-metadata-item ')]")
+        href = renderer.xpath(".//a[@id='video-title-link' or @id='thumbnail']/@href")
+        title = title[0].text_content().strip() if title else None
+        views = meta[0].text_content().strip() if meta else None
+        upload_date = meta[1].text_content().strip() if len(meta) > 1 else None
+        video_id = video_id_from_href(href[0] if href else None)
+        if not title or not views or not upload_date or (video_id or title) in seen:
+            continue
+        seen.add(video_id or title)
+        videos.append({"video_id": video_id, "title": title, "views": views, "upload_date": upload_date})
+    return videos
+
+def wait_for_more_videos(driver, seen_count, timeout=SCROLL_TIMEOUT):
+    """Block until more renderers load or the feed ends; returns (count, feed_has_more)."""
+    state = {}
+
+    def loaded(d):
+        state['count'], state['more'] = d.execute_script(FEED_STATE_JS)
+        return state['count'] > seen_count or not state['more']
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.25).until(loaded)
+    except TimeoutException:
+        pass
+    return state.get('count', seen_count), state.get('more', False)
+
+def scrape_youtube_videos(url, progress=None, pool=None, max_videos=None, since_date=None, stats=None, sink=None,
+                          index=None, archive=None):
+    """Scrape the videos on a channel's videos page, newest first.
+
+    Scrolling stops at the end of the feed, once ``max_videos`` have been
+    collected, or at the first video uploaded before ``since_date``.
+    ``progress(scrolls_done, videos_found)`` is called after every scroll and
+    time spent waiting versus extracting is added to ``stats`` (a ScrapeStats).
+    Each scroll's new videos are handed to ``sink.write`` (an ExportSink)
+    instead of being collected and returned, so memory stays flat however long
+    the feed is. The browser is leased from ``pool`` (the shared pool by
+    default). The scrolled page's DOM is handed to ``archive.add`` (an ArchiveRecorder).
+
+    With a ChannelIndex as ``index`` the scrape is incremental: scrolling also
+    stops at the first video already in the index, and the stored videos are
+    returned (or written) after the new ones. If it stops before reaching one,
+    only the new videos are, and the index keeps the older ones for later.
+    Known videos are only stop points when the stored run reaches the end of
+    the feed or holds everything asked for; otherwise the feed is scrolled
+    again from the top.
+    """
     if not url:
         return []
         
-    driver = setup_driver()
-    driver.get(url)
-    random_wait()
-    
+    pool = pool or get_default_pool()
+    stats = stats if stats is not None else ScrapeStats()
+    if isinstance(since_date, date) and not isinstance(since_date, datetime):
+        since_date = datetime.combine(since_date, datetime.min.time())
+    if not index:
+        with pool.lease(stats=stats) as driver:
+            video_data, _, _ = _scroll_feed(driver, url, progress, max_videos, since_date, stats, sink,
+                                         archive=archive, keep=sink is None)
+        return video_data
+
+    with index.lock(url):
+        head, head_reaches_end = index.head(url)
+        if head_reaches_end or _covers(head, max_videos, since_date):
+            known_ids = {video['video_id'] for video in head}
+        else:
+            # Stopping at the stored run would come up short, so read past it
+            known_ids = frozenset()
+        with pool.lease(stats=stats) as driver:
+            # The new videos are kept even with a sink, since the index stores them all anyway
+            video_data, reached_known, reached_end = _scroll_feed(driver, url, progress, max_videos, since_date,
+                                                                  stats, sink, known_ids, archive)
+        if not video_data and not reached_known:
+            # Nothing loaded at all; keep the index as it was
+            return video_data
+        stored = index.update(url, video_data, reached_known, reached_end)
+
+    if max_videos:
+        stored = stored[:max(max_videos - len(video_data), 0)]
+    if since_date:
+        stored = _uploaded_since(stored, since_date)
+    # seen_at lets the normalizer resolve the stored relative dates against when they were read
+    stored = [{name: video.get(name) for name in VIDEO_FIELDS + ['seen_at']} for video in stored]
+    stats.count('known_videos', len(stored))
+    if sink:
+        sink.write(stored)
+        return []
+    return video_data + stored
+
+def _covers(head, max_videos, since_date):
+    """Whether a stored run that stops short of the end still holds everything the scrape asks for."""
+    if max_videos and len(head) >= max_videos:
+        return True
+    # The run goes back past since_date if its oldest videos are already too old
+    return bool(since_date) and len(_uploaded_since(head, since_date)) < len(head)
+
+def _uploaded_since(videos, since_date):
+    """Leading run of stored ``videos`` uploaded on or after ``since_date``."""
+    kept = []
+    for video in videos:
+        # Relative dates are as of when the video was seen
+        uploaded = parse_upload_date(video['upload_date'], datetime.fromtimestamp(video['seen_at']))
+        if uploaded and uploaded < since_date:
+            break
+        kept.append(video)
+    return kept
+
+def _scroll_feed(driver, url, progress, max_videos, since_date, stats, sink, known_ids=frozenset(), archive=None,
+                 keep=True):
+    """Scroll a channel's feed and collect its videos; returns (videos, reached_known_video, reached_end).
+
+    With ``keep`` false the videos only go to ``sink`` and the returned list is empty.
+    """
+    now = datetime.now()
     video_data = []
-    scraped_videos = set()
+    found = 0
+    scraped_videos = set()  # Video IDs, or titles for videos without a link
+    reached_known = False
+    reached_end = False
+    scrolls = 0
+    stalls = 0
+    cursor = 0  # Renderers before this index have already been extracted
+    pending_passes = {}  # Renderer index -> passes it has been seen without a title
     
+    started = time.perf_counter()
     try:
-        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "contents")))
+        with stats.time('page_load'):
+            driver.get(url)
+        with stats.time('wait'):
+            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "contents")))
         
-        while True:
-            videos = driver.find_elements(By.XPATH, "//ytd-rich-item-renderer")
+        done = False
+        while not done:
+            with stats.time('extract'):
+                batch = driver.execute_script(EXTRACT_VIDEOS_JS, cursor)
+            first_pending = None
+            new_videos = []
             
-            for video in videos:
-                try:
-                    title_element = video.find_element(By.XPATH, ".//yt-formatted-string[@id='video-title']")
-                    title = title_element.text
-                    if title in scraped_videos:
-                        continue
-                        
-                    views = video.find_element(By.XPATH, ".//span[@class='inline-metadata-item style-scope ytd-video-meta-block']").text
-                    upload_date = video.find_elements(By.XPATH, ".//span[@class='inline-metadata-item style-scope ytd-video-meta-block']")[1].text
-                    
-                    video_info = {
-                        "title": title,
-                        "views": views,
-                        "upload_date": upload_date
-                    }
-                    video_data.append(video_info)
-                    scraped_videos.add(title)
-                except NoSuchElementException:
+            for offset, video in enumerate(batch['videos']):
+                title = video['title']
+                if not title:
+                    # Not rendered yet: pick it up again on the next pass, unless it never will be
+                    index = cursor + offset
+                    pending_passes[index] = pending_passes.get(index, 0) + 1
+                    if first_pending is None and pending_passes[index] <= MAX_PENDING_PASSES:
+                        first_pending = index
                     continue
+                video_id = video_id_from_href(video['href'])
+                if video_id in known_ids:
+                    reached_known = done = True
+                    break
+                if (video_id or title) in scraped_videos or not video['views'] or not video['upload_date']:
+                    continue
+                if since_date:
+                    uploaded = parse_upload_date(video['upload_date'], now)
+                    if uploaded and uploaded < since_date:
+                        done = True
+                        break
+                    
+                video_info = {
+                    "video_id": video_id,
+                    "title": title,
+                    "views": video['views'],
+                    "upload_date": video['upload_date']
+                }
+                new_videos.append(video_info)
+                scraped_videos.add(video_id or title)
+                if max_videos and found + len(new_videos) >= max_videos:
+                    done = True
+                    break
+            
+            found += len(new_videos)
+            if keep:
+                video_data.extend(new_videos)
+            if sink:
+                sink.write(new_videos)
+            cursor = first_pending if first_pending is not None else batch['total']
+            if done:
+                break
             
-            last_height = driver.execute_script("return document.documentElement.scrollHeight")
             driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
-            random_wait()
-            new_height = driver.execute_script("return document.documentElement.scrollHeight")
+            with stats.time('wait'):
+                count, more = wait_for_more_videos(driver, batch['total'])
+            scrolls += 1
+            stats.count('scrolls')
+            if progress:
+                progress(scrolls, found)
             
-            if new_height == last_height:
+            if count > batch['total']:
+                stalls = 0
+            elif not more:
+                reached_end = True
                 break
+            else:
+                # The spinner is still there, so the network is just slow
+                stalls += 1
+                stats.count('stalls')
+                if stalls > MAX_STALLS:
+                    stats.count('stalled_out')
+                    break
                 
     except TimeoutException:
-        print("Timed out waiting for page elements to load")
-    finally:
-        driver.quit()
+        logger.warning(f"Timed out waiting for page elements to load on {url}")
+        stats.count('timeouts')
+    # The feed is one page however far it was scrolled, so this covers every batch loaded
+    log_page_load(driver, url, time.perf_counter() - started, stats)
+    if archive and found:
+        with stats.time('archive'):
+            archive.add(driver.page_source, url)
     
-    # Ensure output directory exists
-    os.makedirs('output', exist_ok=True)
-    
-    # Save data to Excel, CSV, and JSON
-    if video_data:
-        df = pd.DataFrame(video_data)
-        df.to_excel("output/youtube_videos.xlsx", index=False)
-        df.to_csv("output/youtube_videos.csv", index=False)
-        
-    return video_data
\ No newline at end of file
+    return video_data, reached_known, reached_end